@@ -0,0 +1,93 @@
+"""
+Per-lookup cost of the hot channel / inventory queries, as query() calls and as
+the select() statements of models.queries, with and without server-side
+prepared statements. Run it on a direct database connection, not PgBouncer.
+
+    cd src
+    python -m benchmarks.channel_lookup --iterations 5000
+
+Runs against the configured database and only reads from it.
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from config.database import create_db_engine
+from models import Channel, InventoryRequest
+from models.queries import (
+    CHANNEL_BY_SHOP_ID,
+    CHANNEL_BY_UID,
+    PENDING_INVENTORY_REQUESTS,
+)
+
+
+def legacy_lookups(db: Session, channel: Channel):
+    db.query(Channel).filter(Channel.shop_id == int(channel.shop_id)).first()
+    db.query(Channel).filter(Channel.channel_uid == channel.channel_uid).first()
+    db.query(InventoryRequest).filter(
+        InventoryRequest.channel_uid == channel.channel_uid,
+        InventoryRequest.status == InventoryRequest.StatusChoices.PENDING,
+        InventoryRequest.created_at >= (datetime.now() - timedelta(days=2)),
+    ).order_by(InventoryRequest.created_at.asc()).all()
+
+
+def statement_lookups(db: Session, channel: Channel):
+    db.execute(CHANNEL_BY_SHOP_ID, {"shop_id": int(channel.shop_id)}).scalars().first()
+    db.execute(CHANNEL_BY_UID, {"channel_uid": channel.channel_uid}).scalars().first()
+    db.execute(
+        PENDING_INVENTORY_REQUESTS,
+        {
+            "channel_uid": channel.channel_uid,
+            "since": datetime.now() - timedelta(days=2),
+        },
+    ).scalars().all()
+
+
+def run(name, lookups, prepare_threshold, channels, iterations):
+    engine = create_db_engine(
+        "worker", connect_args={"prepare_threshold": prepare_threshold}
+    )
+    with Session(bind=engine) as db:
+        for channel in channels:  # warm up the pool and the caches
+            lookups(db, channel)
+        started = time.perf_counter()
+        for i in range(iterations):
+            lookups(db, channels[i % len(channels)])
+            db.expunge_all()
+        elapsed = time.perf_counter() - started
+    engine.dispose()
+    # Every iteration runs three queries
+    per_lookup = elapsed / (iterations * 3) * 1_000_000
+    print(f"{name:<40} {per_lookup:10.1f} us/lookup")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    engine = create_db_engine("worker")
+    with Session(bind=engine) as db:
+        channels = db.execute(select(Channel).limit(50)).scalars().all()
+        db.expunge_all()
+    engine.dispose()
+    if not channels:
+        print("No channels in the database to look up")
+        return
+
+    variants = [
+        ("query(), no prepared statements", legacy_lookups, None),
+        ("query(), prepared statements", legacy_lookups, 1),
+        ("select(), no prepared statements", statement_lookups, None),
+        ("select(), prepared statements", statement_lookups, 1),
+    ]
+    for name, lookups, prepare_threshold in variants:
+        run(name, lookups, prepare_threshold, channels, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
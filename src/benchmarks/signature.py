@@ -0,0 +1,163 @@
+"""
+Request signing: the current signer against the implementation it replaced.
+
+    cd src
+    python -m benchmarks.signature --iterations 20000
+
+Both signers must agree on every sample request before they are timed.
+"""
+
+import argparse
+import hashlib
+import hmac
+import time
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from utils.signing import calculate_signature, sign_requests
+
+SECRET = "benchmark-secret"
+BASE_URL = "https://open-api.tiktokglobalshop.com"
+
+SAMPLES = [
+    (
+        "/order/202309/orders",
+        {
+            "ids": ["576461413038785752"],
+            "shop_cipher": "GCP_XF90igAAAABh00qsWgtvOiGFNqyubMt3",
+            "app_key": "6abc123",
+        },
+        None,
+    ),
+    (
+        "/product/202309/products/search",
+        {
+            "page_size": 100,
+            "page_token": "",
+            "shop_cipher": "GCP_XF90igAAAABh00qsWgtvOiGFNqyubMt3",
+            "app_key": "6abc123",
+        },
+        b'{"status": "ACTIVATE"}',
+    ),
+    (
+        "/product/202309/products/1729582718312380123/inventory/update",
+        {
+            "shop_cipher": "GCP_XF90igAAAABh00qsWgtvOiGFNqyubMt3",
+            "app_key": "6abc123",
+            "access_token": "skip",
+        },
+        '{"skus": [{"id": "1729582718312445659", "inventory": [{"quantity": 3, "warehouse_id": "7068517275539719942"}]}]}',
+    ),
+    (
+        "/authorization/202309/shops",
+        {"app_key": "6abc123", "sign": "old", "flag": True, "empty": []},
+        None,
+    ),
+]
+
+
+def legacy_calculate_signature(
+    url: str, params: dict, headers: dict, secret: str, body: bytes = None, **kwargs
+):
+    """
+    Calculate the signature based on query parameters, request path, and body.
+
+    :param req: A dictionary representing the request with keys 'url', 'headers', and 'body'.
+                - 'url' should contain the full URL of the request.
+                - 'headers' should be a dictionary of HTTP headers.
+                - 'body' should be a byte stream or a string of the request body.
+    :param secret: The app secret key used for signing.
+    :return: The calculated signature as a hexadecimal string.
+    """
+    # Parse query parameters from the URL
+    url_parts = urlparse(url)
+    query_string = urlencode(params, doseq=True)
+    queries = parse_qs(query_string)
+
+    for k, v in kwargs.items():
+        queries[k] = [str(v)]
+
+    # Extract all query parameters excluding 'sign' and 'access_token'
+    keys = [k for k in queries if k not in {"sign", "access_token"}]
+
+    # Reorder the parameters' keys in alphabetical order
+    keys.sort()
+
+    # Concatenate all the parameters in the format of {key}{value}
+    input_data = ""
+    for key in keys:
+        input_data += key + "".join(
+            queries[key]
+        )  # Join query values as a single string
+
+    # Append the request path
+    input_data = url_parts.path + input_data
+
+    # Check if Content-Type is not multipart/form-data and append body if needed
+    content_type = headers.get("Content-Type", "")
+    if not content_type.startswith("multipart/form-data"):
+        if isinstance(body, bytes):
+            body = body.decode("utf-8")
+
+        if body is not None:
+            input_data += body
+
+    # Wrap the generated string with the App secret
+    input_data = secret + input_data + secret
+    # Generate the HMAC-SHA256 signature
+    return hmac.new(
+        secret.encode("utf-8"), input_data.encode("utf-8"), hashlib.sha256
+    ).hexdigest()
+
+
+def new_calculate_signature(url, params, headers, secret, body=None, **kwargs):
+    return calculate_signature(url, params, headers, secret, body, **kwargs)
+
+
+def timed(sign, iterations: int) -> float:
+    headers = {"Content-Type": "application/json"}
+    started = time.perf_counter()
+    for i in range(iterations):
+        path, params, body = SAMPLES[i % len(SAMPLES)]
+        sign(BASE_URL + path, params, headers, SECRET, body, timestamp=1700000000 + i)
+    return (time.perf_counter() - started) / iterations * 1_000_000
+
+
+def timed_batch(iterations: int) -> float:
+    batch = [
+        (path, {**params, "timestamp": 1700000000 + i}, body)
+        for i in range(iterations)
+        for path, params, body in [SAMPLES[i % len(SAMPLES)]]
+    ]
+    started = time.perf_counter()
+    sign_requests(batch, SECRET)
+    return (time.perf_counter() - started) / iterations * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    headers = {"Content-Type": "application/json"}
+    for path, params, body in SAMPLES:
+        expected = legacy_calculate_signature(
+            BASE_URL + path, params, headers, SECRET, body, timestamp=1700000000
+        )
+        actual = new_calculate_signature(
+            BASE_URL + path, params, headers, SECRET, body, timestamp=1700000000
+        )
+        assert expected == actual, f"Signatures differ for {path}"
+
+    print(
+        f"{'legacy calculate_signature':<30} {timed(legacy_calculate_signature, args.iterations):8.2f} us/request"
+    )
+    print(
+        f"{'calculate_signature':<30} {timed(new_calculate_signature, args.iterations):8.2f} us/request"
+    )
+    print(
+        f"{'sign_requests (batch)':<30} {timed_batch(args.iterations):8.2f} us/request"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+TikTok client throughput against the fake TikTok Shop server.
+
+    cd src
+    python -m fakes.tiktok_server &
+    TIKTOK_OPEN_API_URL=http://localhost:9100 TIKTOK_AUTH_URL=http://localhost:9100 \
+        python -m benchmarks.tiktok_client --threads 32 --seconds 10
+
+Every thread reads product details, searches product and order pages and
+updates inventory in turn. The client rate limits apply, set
+TIKTOK_RATE_LIMIT_<CLASS>=0 to measure the client alone.
+"""
+
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config.app_vars import FAKE_TIKTOK_PRODUCTS
+from fakes.tiktok_server import PRODUCT_ID_BASE, SHOP_CIPHER, SKU_ID_BASE
+from utils.tiktok_client import tiktok_client
+
+ACCESS_TOKEN = "FAKE_ACCESS_TOKEN"
+
+
+def one_round(rng: random.Random):
+    index = rng.randrange(FAKE_TIKTOK_PRODUCTS)
+    product_id = str(PRODUCT_ID_BASE + index)
+    calls = [
+        ("get_product", {"product_id": product_id}),
+        ("search_products", {"params": {"page_size": 50}, "body": {}}),
+        (
+            "search_orders",
+            {"params": {"page_size": 50}, "body": {"create_time_ge": 0}},
+        ),
+        (
+            "update_inventory",
+            {
+                "product_id": product_id,
+                "body": {
+                    "skus": [
+                        {
+                            "id": str(SKU_ID_BASE + index * 10),
+                            "inventory": [{"quantity": rng.randint(0, 100)}],
+                        }
+                    ]
+                },
+            },
+        ),
+    ]
+    failed = 0
+    for name, kwargs in calls:
+        response = tiktok_client.request(
+            name, access_token=ACCESS_TOKEN, shop_cipher=SHOP_CIPHER, **kwargs
+        )
+        failed += response.code != 0
+    return len(calls), failed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    deadline = time.monotonic() + args.seconds
+    totals = {"calls": 0, "failed": 0}
+    lock = threading.Lock()
+
+    def worker(seed: int):
+        rng = random.Random(seed)
+        while time.monotonic() < deadline:
+            calls, failed = one_round(rng)
+            with lock:
+                totals["calls"] += calls
+                totals["failed"] += failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        list(executor.map(worker, range(args.threads)))
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"{totals['calls']} calls in {elapsed:.1f}s, "
+        f"{totals['calls'] / elapsed:.1f} calls/s, {totals['failed']} failed"
+    )
+    for name, stats in tiktok_client.stats.snapshot().items():
+        print(
+            f"{name:<20} calls {stats['calls']:>7} errors {stats['errors']:>5} "
+            f"retries {stats['retries']:>5} avg {stats['latency_avg'] * 1000:7.1f} ms "
+            f"max {stats['latency_max'] * 1000:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
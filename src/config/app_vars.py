@@ -17,12 +17,163 @@ DB_USER = os.getenv("DB_USER")
 DB_PASS = os.getenv("DB_PASS")
 DB_PORT = int(os.getenv("DB_PORT"))
 
+# Asyncio worker (python -m workers.asyncio_worker) for the I/O bound tasks
+ASYNC_WORKER_CONCURRENCY = int(os.getenv("ASYNC_WORKER_CONCURRENCY", 200))
+# Comma separated queue names, all Celery queues when empty
+ASYNC_WORKER_QUEUES = [
+    queue for queue in os.getenv("ASYNC_WORKER_QUEUES", "").split(",") if queue
+]
+
+# Connection pool of every process, per role: "api" (uvicorn), "worker"
+# (Celery prefork task processes), "consumer" (Kombu consumers in the prefork
+# parent), "async_worker" (the asyncio worker, whose tasks share one process)
+# and "thread_worker" (Celery threads/gevent/eventlet/solo workers, sized to the
+# worker concurrency when they start). A "<role>_sync" entry sizes the sync
+# engine of a role whose process mostly uses the async one.
+DB_ROLE = os.getenv("DB_ROLE", "api")
+
+
+def db_pool_settings(role: str, pool_size: int, overflow: int) -> dict:
+    """Pool settings of `role`, DB_<ROLE>_POOL_SIZE / _MAX_OVERFLOW take precedence."""
+    return {
+        "pool_size": int(os.getenv(f"DB_{role.upper()}_POOL_SIZE", pool_size)),
+        "max_overflow": int(os.getenv(f"DB_{role.upper()}_MAX_OVERFLOW", overflow)),
+    }
+
+
+DB_POOL_SETTINGS = {
+    role: db_pool_settings(role, pool_size, overflow)
+    for role, pool_size, overflow in (
+        ("api", 10, 10),
+        # Only the short idempotency, coalescing and sync run queries of the API
+        ("api_sync", 5, 5),
+        ("worker", 2, 2),
+        ("consumer", 2, 1),
+        (
+            "async_worker",
+            max(ASYNC_WORKER_CONCURRENCY // 4, 2),
+            max(ASYNC_WORKER_CONCURRENCY // 4, 2),
+        ),
+    )
+}
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# Executions before psycopg uses a server-side prepared statement, psycopg's 5 by
+# default. "none" disables them, which PgBouncer before 1.21 in transaction mode
+# needs; 0 or 1 prepare eagerly and should only be set on a direct connection.
+DB_PREPARE_THRESHOLD = (
+    None
+    if os.getenv("DB_PREPARE_THRESHOLD", "5").lower() == "none"
+    else int(os.getenv("DB_PREPARE_THRESHOLD", "5"))
+)
+
+# Number of sub-queues every Celery queue is split into for per shop fairness
+FAIR_QUEUE_SHARDS = int(os.getenv("FAIR_QUEUE_SHARDS", 1))
+WORKER_PREFETCH_MULTIPLIER = int(os.getenv("WORKER_PREFETCH_MULTIPLIER", 4))
+
 # Celery Beat Schedule Time in seconds
 CELERY_BEAT_SCHEDULE_TIME = int(os.getenv("CELERY_BEAT_SCHEDULE_TIME", 120))
 
+# Catalogue sync across all channels
+PRODUCT_SYNC_CONCURRENCY = int(os.getenv("PRODUCT_SYNC_CONCURRENCY", 4))
+# Hour of the day (0-23) for the nightly full refresh, disabled when not set
+PRODUCT_FULL_SYNC_HOUR = os.getenv("PRODUCT_FULL_SYNC_HOUR")
+# A RUNNING sync run without a checkpoint for this long is taken over by the
+# next worker that claims it
+SYNC_RUN_STALE_SECONDS = int(os.getenv("SYNC_RUN_STALE_SECONDS", 15 * 60))
+
+# Reject webhooks without a valid TikTok Authorization signature
+WEBHOOK_VERIFY_SIGNATURE = os.getenv("WEBHOOK_VERIFY_SIGNATURE", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# Forward raw webhook bodies to the worker after a minimal orjson check,
+# the full pydantic validation then happens in the worker
+WEBHOOK_FAST_INGEST = os.getenv("WEBHOOK_FAST_INGEST", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# Webhooks are spooled to disk when publishing to RabbitMQ fails, and replayed
+# by the API process once the broker is reachable again
+WEBHOOK_SPOOL_DIR = os.getenv("WEBHOOK_SPOOL_DIR", "/tmp/tiktok-webhook-spool")
+WEBHOOK_SPOOL_MAX_BYTES = int(os.getenv("WEBHOOK_SPOOL_MAX_BYTES", 256 * 1024 * 1024))
+WEBHOOK_SPOOL_SEGMENT_BYTES = int(
+    os.getenv("WEBHOOK_SPOOL_SEGMENT_BYTES", 8 * 1024 * 1024)
+)
+WEBHOOK_SPOOL_DRAIN_INTERVAL = float(os.getenv("WEBHOOK_SPOOL_DRAIN_INTERVAL", 5))
+# Connections kept by the confirm mode publisher pool of every process
+PUBLISHER_POOL_SIZE = int(os.getenv("PUBLISHER_POOL_SIZE", 4))
+# Seconds to wait for the broker to confirm a batch of published messages
+PUBLISHER_CONFIRM_TIMEOUT = float(os.getenv("PUBLISHER_CONFIRM_TIMEOUT", 10))
+# Batched order / product messages to the core service
+CORE_SERVICE_PUBLISH = os.getenv("CORE_SERVICE_PUBLISH", "false").lower() == "true"
+PUBLISH_BATCH_MAX_BYTES = int(os.getenv("PUBLISH_BATCH_MAX_BYTES", 256 * 1024))
+PUBLISH_BATCH_COMPRESS = os.getenv("PUBLISH_BATCH_COMPRESS", "false").lower() == "true"
+# Seconds to wait for a broker connection before a publish counts as failed
+BROKER_CONNECTION_TIMEOUT = float(os.getenv("BROKER_CONNECTION_TIMEOUT", 4))
+
+# Webhook redeliveries with an already seen tts_notification_id are dropped
+WEBHOOK_DEDUP_TTL = int(os.getenv("WEBHOOK_DEDUP_TTL", 24 * 60 * 60))
+WEBHOOK_DEDUP_MEMORY_SIZE = int(os.getenv("WEBHOOK_DEDUP_MEMORY_SIZE", 10000))
+
+# Order webhooks are delayed by this many seconds and only the newest
+# update_time of an order is processed, 0 disables the coalescing
+ORDER_WEBHOOK_COALESCE_SECONDS = int(os.getenv("ORDER_WEBHOOK_COALESCE_SECONDS", 5))
+
 APP_KEY = os.getenv("APP_KEY")
 APP_SECRET = os.getenv("APP_SECRET")
 
+# TikTok Shop API client (utils/tiktok_client.py)
+TIKTOK_OPEN_API_URL = os.getenv(
+    "TIKTOK_OPEN_API_URL", "https://open-api.tiktokglobalshop.com"
+).rstrip("/")
+TIKTOK_AUTH_URL = os.getenv("TIKTOK_AUTH_URL", "https://auth.tiktok-shops.com").rstrip(
+    "/"
+)
+# Keep-alive connections per host, shared by the threads of a process
+TIKTOK_HTTP_POOL_SIZE = int(os.getenv("TIKTOK_HTTP_POOL_SIZE", 20))
+# Retries of connection errors, 429 and 5xx, waiting TIKTOK_RETRY_BACKOFF * 2^n
+TIKTOK_MAX_RETRIES = int(os.getenv("TIKTOK_MAX_RETRIES", 2))
+TIKTOK_RETRY_BACKOFF = float(os.getenv("TIKTOK_RETRY_BACKOFF", 0.5))
+# A longer Retry-After is not waited for, the response is returned for the task
+# to retry later instead of holding its thread
+TIKTOK_MAX_RETRY_AFTER = float(os.getenv("TIKTOK_MAX_RETRY_AFTER", 10))
+# Requests per second per shop and rate limit class of the endpoint table, in
+# every process: N processes calling one shop may send up to N times the limit.
+# TIKTOK_RATE_LIMIT_<CLASS>=0 disables the limit of a class
+TIKTOK_RATE_LIMITS = {
+    rate_class: float(os.getenv(f"TIKTOK_RATE_LIMIT_{rate_class.upper()}", rate))
+    for rate_class, rate in (
+        ("auth", 5),
+        ("shop", 5),
+        ("order", 20),
+        ("product", 20),
+        ("inventory", 10),
+        ("fulfillment", 10),
+    )
+}
+
+# Fake TikTok Shop server for load tests (python -m fakes.tiktok_server), point
+# TIKTOK_OPEN_API_URL and TIKTOK_AUTH_URL at it
+FAKE_TIKTOK_PORT = int(os.getenv("FAKE_TIKTOK_PORT", 9100))
+FAKE_TIKTOK_LATENCY_MS = float(os.getenv("FAKE_TIKTOK_LATENCY_MS", 80))
+FAKE_TIKTOK_LATENCY_JITTER_MS = float(os.getenv("FAKE_TIKTOK_LATENCY_JITTER_MS", 40))
+# Share of requests answered with a 500, 0-1
+FAKE_TIKTOK_ERROR_RATE = float(os.getenv("FAKE_TIKTOK_ERROR_RATE", 0))
+# Requests per second per shop before a 429, 0 disables the throttling
+FAKE_TIKTOK_RATE_LIMIT = float(os.getenv("FAKE_TIKTOK_RATE_LIMIT", 0))
+FAKE_TIKTOK_PRODUCTS = int(os.getenv("FAKE_TIKTOK_PRODUCTS", 1000))
+FAKE_TIKTOK_ORDERS = int(os.getenv("FAKE_TIKTOK_ORDERS", 1000))
+FAKE_TIKTOK_SEED = int(os.getenv("FAKE_TIKTOK_SEED", 1))
+FAKE_TIKTOK_VERIFY_SIGNATURE = (
+    os.getenv("FAKE_TIKTOK_VERIFY_SIGNATURE", "true").lower() == "true"
+)
+
 MYE_INVENTORY_AND_MAPPING_SERVICE_URL = os.environ.get("MIAMS_URL")
 MYE_ORDER_SERVICE_URL = os.environ.get("MYE_ORDER_SERVICE_URL")
 INTEGRATION_SERVICE = os.environ.get("INTEGRATION_SERVICE")
@@ -1,13 +1,163 @@
 # from core.query_manager import SoftDeleteQueryManager
-from sqlalchemy import create_engine
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
-from config.app_vars import DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER
+from config.app_vars import (
+    DB_HOST,
+    DB_NAME,
+    DB_PASS,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SETTINGS,
+    DB_POOL_TIMEOUT,
+    DB_PORT,
+    DB_PREPARE_THRESHOLD,
+    DB_ROLE,
+    DB_USER,
+)
 
 POSTGRES_URL = f"postgresql+psycopg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-engine = create_engine(POSTGRES_URL)
+
+class TimedPoolMixin:
+    """Records how long pool checkouts wait for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.failures = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with self.stats_lock:
+                self.failures += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self.stats_lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+    def recreate(self):
+        # dispose() replaces the pool, the counters live on
+        pool = super().recreate()
+        pool.checkouts, pool.wait_total = self.checkouts, self.wait_total
+        pool.wait_max, pool.failures = self.wait_max, self.failures
+        return pool
+
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+engines: Dict[str, Engine] = {}
+async_engines: Dict[str, AsyncEngine] = {}
+
+
+def _engine_options(role: str, **overrides) -> Dict[str, Any]:
+    options = dict(
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        # psycopg prepares a statement on the server after this many executions
+        connect_args={"prepare_threshold": DB_PREPARE_THRESHOLD},
+        **DB_POOL_SETTINGS[role],
+    )
+    options.update(overrides)
+    return options
+
+
+def create_db_engine(role: str, **overrides) -> Engine:
+    pool_settings = DB_POOL_SETTINGS.get(f"{role}_sync", {})
+    return create_engine(
+        POSTGRES_URL,
+        poolclass=TimedQueuePool,
+        **_engine_options(role, **{**pool_settings, **overrides}),
+    )
+
+
+def create_async_db_engine(role: str, **overrides) -> AsyncEngine:
+    return create_async_engine(
+        POSTGRES_URL,
+        poolclass=TimedAsyncQueuePool,
+        **_engine_options(role, **overrides),
+    )
+
+
+def get_engine(role: str) -> Engine:
+    if role not in engines:
+        engines[role] = create_db_engine(role)
+    return engines[role]
+
+
+def get_async_engine(role: str) -> AsyncEngine:
+    if role not in async_engines:
+        async_engines[role] = create_async_db_engine(role)
+    return async_engines[role]
+
+
+engine = get_engine(DB_ROLE)
+async_engine = get_async_engine(DB_ROLE)
+
+
+def use_db_role(role: str):
+    """Bind `engine` and `SessionLocal` of this process to the pool of `role`."""
+    global engine, async_engine
+    engine = get_engine(role)
+    async_engine = get_async_engine(role)
+    SessionLocal.configure(bind=engine)
+    AsyncSessionLocal.configure(bind=async_engine)
+
+
+def dispose_engines_after_fork():
+    """Drop the connections inherited from the parent without closing them."""
+    for inherited in engines.values():
+        inherited.dispose(close=False)
+    for inherited in async_engines.values():
+        inherited.sync_engine.dispose(close=False)
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    stats = {}
+    pools = [(role, e.pool) for role, e in engines.items()]
+    pools += [(f"{role}_async", e.pool) for role, e in async_engines.items()]
+    for role, pool in pools:
+        with pool.stats_lock:
+            stats[role] = {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+                "checkouts": pool.checkouts,
+                "wait_avg_ms": round(
+                    pool.wait_total / pool.checkouts * 1000 if pool.checkouts else 0, 3
+                ),
+                "wait_max_ms": round(pool.wait_max * 1000, 3),
+                "failures": pool.failures,
+            }
+    return stats
 
 
 def get_db():
@@ -18,6 +168,21 @@ def get_db():
         db.close()
 
 
+async def ping_database() -> bool:
+    """`SELECT 1` on a pooled connection of the async engine."""
+    try:
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        return True
+    except Exception:
+        return False
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 # class SoftDeleteSession(Session):
 #     """
 #     Custom session to override the delete() method for soft deletion.
@@ -40,3 +205,7 @@ def get_db():
 
 Base = declarative_base()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Objects stay loaded after commit, async sessions cannot lazy load them later
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
@@ -1,23 +1,107 @@
+import zlib
+
 from celery import Celery
-from celery.signals import task_received
+from celery.schedules import crontab
+from celery.concurrency import get_implementation
+from celery.concurrency.prefork import TaskPool as PreforkPool
+from celery.signals import (
+    task_received,
+    worker_init,
+    worker_process_init,
+    worker_process_shutdown,
+    worker_shutdown,
+)
 from kombu import Queue
 
-from config.app_vars import RABBIT_URL, CELERY_BEAT_SCHEDULE_TIME
+from config.database import dispose_engines_after_fork, get_pool_stats, use_db_role
+from utils.async_runtime import start_async_runtime, stop_async_runtime
+from config.app_vars import (
+    BROKER_CONNECTION_TIMEOUT,
+    DB_POOL_SETTINGS,
+    FAIR_QUEUE_SHARDS,
+    RABBIT_URL,
+    CELERY_BEAT_SCHEDULE_TIME,
+    PRODUCT_FULL_SYNC_HOUR,
+    WORKER_PREFETCH_MULTIPLIER,
+    db_pool_settings,
+)
 
 cel_app = Celery("tiktok-tasks", broker=RABBIT_URL, include=["tasks", "consumers"])
 
-cel_app.conf.task_queues = [
-    Queue(
+# Every queue is split in FAIR_QUEUE_SHARDS sub-queues and the shops are hashed
+# onto them, so one busy shop only fills its own sub-queue. Shard 0 keeps the
+# original queue name.
+BASE_QUEUES = {
+    "tiktok_high_priority_queue": (
+        "tiktok_high_priority_queue_exchange",
         "tiktok_high_priority_queue",
-        exchange="tiktok_high_priority_queue_exchange",
-        routing_key="tiktok_high_priority_queue",
     ),
-    Queue("tiktok-queue", exchange="tiktok_queue_exchange", routing_key="tiktok_queue"),
+    "tiktok-queue": ("tiktok_queue_exchange", "tiktok_queue"),
+}
+
+# Tasks keyed by the TikTok shop id, passed as the shop_id kwarg or the first
+# argument. Every task of a shop must use the same key to land on one shard.
+SHOP_SCOPED_TASKS = {
+    "tasks.authorization.expire",
+    "tasks.message.new_message",
+    "tasks.product.sync",
+    "tasks.product.update",
+    "tasks.product.fetch_all_products",
+    "tasks.inventory_tasks.update_inventory_stock",
+}
+
+
+def shard_queue(base_queue: str, shop_key) -> str:
+    """Name of the sub-queue of `base_queue` the shop is hashed onto."""
+    if FAIR_QUEUE_SHARDS <= 1 or shop_key is None:
+        return base_queue
+    shard = zlib.crc32(str(shop_key).encode("utf-8")) % FAIR_QUEUE_SHARDS
+    return base_queue if shard == 0 else f"{base_queue}.{shard}"
+
+
+def route_by_shop(name, args, kwargs, options, task=None, **kw):
+    """Celery router sending shop scoped tasks to the sub-queue of their shop."""
+    if name not in SHOP_SCOPED_TASKS:
+        return None
+    shop_key = kwargs.get("shop_id")
+    if shop_key is None and args:
+        shop_key = args[0]
+    return {"queue": shard_queue(cel_app.conf.task_default_queue, shop_key)}
+
+
+cel_app.conf.task_queues = [
+    Queue(
+        name if shard == 0 else f"{name}.{shard}",
+        exchange=exchange,
+        routing_key=routing_key if shard == 0 else f"{routing_key}.{shard}",
+    )
+    for name, (exchange, routing_key) in BASE_QUEUES.items()
+    for shard in range(max(FAIR_QUEUE_SHARDS, 1))
 ]
+cel_app.conf.task_routes = (route_by_shop,)
+# A low prefetch keeps a worker from hoarding one shop's backlog
+cel_app.conf.worker_prefetch_multiplier = WORKER_PREFETCH_MULTIPLIER
 
 cel_app.conf.task_default_queue = "tiktok-queue"
+cel_app.conf.broker_connection_timeout = BROKER_CONNECTION_TIMEOUT
 cel_app.autodiscover_tasks()
 
+cel_app.conf.beat_schedule = {
+    "purge-webhook-notifications": {
+        "task": "tasks.webhook.purge_notifications",
+        "schedule": crontab(minute=30),
+        "args": (),
+        "options": {"queue": "tiktok-queue"},
+    }
+}
+if PRODUCT_FULL_SYNC_HOUR:
+    cel_app.conf.beat_schedule["nightly-product-full-sync"] = {
+        "task": "tasks.product.fetch_all_channels",
+        "schedule": crontab(hour=int(PRODUCT_FULL_SYNC_HOUR), minute=0),
+        "args": (),
+        "options": {"queue": "tiktok-queue"},
+    }
+
 
 # cel_app.conf.beat_schedule = {
 #     "update-product-inveontory-stock": {
@@ -43,6 +127,50 @@ cel_app.autodiscover_tasks()
 #         'options': {'queue': 'woocommerce-queue'},
 #     }
 # }
+def runs_tasks_in_process(worker) -> bool:
+    """True when the worker runs its tasks itself instead of in forked children."""
+    return not issubclass(get_implementation(worker.pool_cls), PreforkPool)
+
+
+@worker_init.connect
+def on_worker_init(sender=None, **kwargs):
+    if sender is None or not runs_tasks_in_process(sender):
+        # The prefork parent process only runs the Kombu consumers
+        use_db_role("consumer")
+        return
+    # Threads, gevent, eventlet and solo pools run every task in this process
+    # and worker_process_init never fires: one connection per concurrent task
+    concurrency = sender.concurrency
+    DB_POOL_SETTINGS["thread_worker"] = db_pool_settings(
+        "thread_worker",
+        max(concurrency // 2, 2),
+        max(concurrency - concurrency // 2, 2),
+    )
+    use_db_role("thread_worker")
+    start_async_runtime(concurrency)
+
+
+@worker_shutdown.connect
+def on_worker_shutdown(sender=None, **kwargs):
+    if sender is not None and runs_tasks_in_process(sender):
+        stop_async_runtime()
+        print(f"Database pool stats: {get_pool_stats()}")
+
+
+@worker_process_init.connect
+def on_worker_process_init(**kwargs):
+    dispose_engines_after_fork()
+    use_db_role("worker")
+    # One event loop per worker process, shared by every task it runs
+    start_async_runtime()
+
+
+@worker_process_shutdown.connect
+def on_worker_process_shutdown(**kwargs):
+    stop_async_runtime()
+    print(f"Database pool stats: {get_pool_stats()}")
+
+
 @task_received.connect
 def on_task_received(sender=None, request=None, **kwargs):
     print("==============================================")
@@ -1,6 +1,5 @@
 import json
 import logging as log
-import asyncio
 from datetime import datetime, timezone, timedelta
 from typing import Dict, Any, List
 from celery import bootsteps
@@ -9,6 +8,7 @@ from sqlalchemy import tuple_
 from config.database import get_db, SessionLocal
 from config.worker import cel_app
 from models import Channel, InventoryRequest
+from utils.async_runtime import run_async
 from utils.maps import Tiktok
 from utils.helpers import get_channel_and_token
 from config.app_vars import (
@@ -22,15 +22,15 @@ inventory_update_queue = Queue(INVENTORY_QUEUE_NAME, exchange, routing_key="")
 
 def update_product_stock_in_tiktok(channel, payload, product_id) -> bool:
     try:
-        response = asyncio.run(
+        response = run_async(
             Tiktok.update_product_inventory(
                 product_id,
                 channel.access_token,
                 channel.shop_cipher,
                 json.dumps(payload),
             )
-        ).json()
-        if response.get("code") == 0:
+        )
+        if response.code == 0:
             log.info(
                 f"Product stock updated successfully in TikTok for product id: {product_id}"
             )
@@ -47,7 +47,7 @@ def insert_inventory_update_request(
 ) -> bool:
     db = next(get_db())
     try:
-        channel = asyncio.run(get_channel_and_token(channel_uid=channel_uid))
+        channel = run_async(get_channel_and_token(channel_uid=channel_uid))
         status = InventoryRequest.StatusChoices.PENDING
 
         if not channel:
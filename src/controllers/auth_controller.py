@@ -3,7 +3,9 @@ from http import HTTPStatus
 from fastapi import Request
 from fastapi.responses import ORJSONResponse
 from pydantic import ValidationError
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from models import Channel
 from serializers import AuthRequest
@@ -39,7 +41,6 @@ async def get_authorized_shops(req: Request):
 
 async def get_active_shops(req: Request):
     try:
-        body = await req.body()
         query_params = req.query_params._dict
         channel_uid: str = query_params.get("channel_uid", None)
 
@@ -57,8 +58,6 @@ async def get_active_shops(req: Request):
             )
         res = await Tiktok.get_active_shops(
             req_params=req.query_params._dict,
-            headers=req.headers,
-            body=body,
             access_token=channel.access_token,
         )
         return ORJSONResponse(content=res.json())
@@ -69,7 +68,7 @@ async def get_active_shops(req: Request):
         return error_message
 
 
-async def integrate_channel(payload: AuthRequest, db: Session):
+async def integrate_channel(payload: AuthRequest, db: AsyncSession):
     try:
         # Get access and refresh tokens
         (
@@ -86,15 +85,13 @@ async def integrate_channel(payload: AuthRequest, db: Session):
             )
         # Get shop details
         shop_resp = await Tiktok.get_authorized_shops(access_token=access_token)
-        shop_data = shop_resp.json()
-
-        if shop_data.get("code") != 0:
+        if shop_resp.code != 0:
             return ORJSONResponse(
                 content={"errors": [{"message": "Failed to retrieve shop details"}]},
                 status_code=HTTPStatus.BAD_REQUEST,
             )
 
-        shops = shop_data.get("data", {}).get("shops", [{}])
+        shops = shop_resp.data.get("shops", [{}])
         shop_id = shops[0].get("id", None)
         shop_cipher = shops[0].get("cipher", None)
 
@@ -104,16 +101,18 @@ async def integrate_channel(payload: AuthRequest, db: Session):
                 status_code=HTTPStatus.BAD_REQUEST,
             )
 
-        # Check for existing channel
-        channel = db.query(Channel).filter_by(shop_cipher=shop_cipher).first()
+        # Check for existing channel, a shop keeps its id when its cipher changes
+        result = await db.execute(select(Channel).filter_by(shop_id=int(shop_id)))
+        channel = result.scalars().first()
 
         if channel:
             # Update existing channel tokens
+            channel.shop_cipher = shop_cipher
             channel.access_token = access_token
             channel.refresh_token = refresh_token
             channel.access_token_expiry = access_token_expires_in
             channel.refresh_token_expiry = refresh_token_expires_in
-            db.commit()
+            await db.commit()
             message = "Channel updated successfully"
         else:
             # Create new channel
@@ -129,7 +128,7 @@ async def integrate_channel(payload: AuthRequest, db: Session):
                 refresh_token_expiry=refresh_token_expires_in,
             )
             db.add(channel)
-            db.commit()
+            await db.commit()
             # Optionally call MIS integration here
             # create_channel_in_mis(new_channel)
             message = "Channel added successfully"
@@ -160,3 +159,10 @@ async def integrate_channel(payload: AuthRequest, db: Session):
             content={"message": f"Validation failed: {str(e)}"},
             status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
         )
+    except IntegrityError:
+        # Another request integrated the same shop at the same time
+        await db.rollback()
+        return ORJSONResponse(
+            content={"message": "Channel of this shop is already being integrated"},
+            status_code=HTTPStatus.CONFLICT,
+        )
@@ -1,7 +1,9 @@
 from http import HTTPStatus
+from typing import Any, AsyncIterator, Dict
 
+import orjson
 from fastapi import Request
-from fastapi.responses import ORJSONResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import ValidationError
 
 from utils.maps import Tiktok
@@ -10,18 +12,13 @@ from utils.helpers import get_channel_and_token
 
 async def get_order_details(req: Request):
     try:
-        body = await req.body()
         channel_uid: str = req.query_params.get("channel_uid", None)
         if not channel_uid:
             return ORJSONResponse(
                 content={"message": "channel_uid is required"},
                 status_code=HTTPStatus.BAD_REQUEST,
             )
-        res = await Tiktok.get_order_details(
-            req_params=req.query_params._dict,
-            headers=req.headers,
-            body=body,
-        )
+        res = await Tiktok.get_order_details(req_params=req.query_params._dict)
         return ORJSONResponse(content=res.json())
 
     except ValidationError as e:
@@ -58,7 +55,45 @@ async def get_single_order_details(order_id: str, channel_uid: str):
         return error_message
 
 
-async def fetch_orders(channel_uid: str = None, days_ago: int = 1):
+async def iter_order_pages(
+    channel, days_ago: int, page_token: str = None, page_size: int = 100
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yield the response data of every order page, starting at page_token."""
+    # Every page must be searched with the same window as the first one
+    create_time_ge = Tiktok.order_window_start(days_ago)
+    while True:
+        response = await Tiktok.get_orders(
+            channel, days_ago, page_token, page_size, create_time_ge
+        )
+        if response.code != 0:
+            print("Failed to get orders from tiktok server:", response.json())
+            raise ValueError(response.message or "Failed to get orders")
+
+        data = response.data
+        yield data
+        page_token = data.get("next_page_token", None)
+        if not data.get("orders") or not page_token:
+            break
+
+
+async def stream_orders_ndjson(channel, days_ago: int) -> AsyncIterator[bytes]:
+    try:
+        async for data in iter_order_pages(channel, days_ago):
+            orders = data.get("orders", [])
+            if orders:
+                yield b"\n".join(orjson.dumps(order) for order in orders) + b"\n"
+    except Exception as e:
+        yield orjson.dumps({"error": str(e)}) + b"\n"
+
+
+async def fetch_orders(
+    channel_uid: str = None,
+    days_ago: int = 1,
+    page_token: str = None,
+    page_size: int = None,
+    stream: bool = False,
+    create_time_ge: int = None,
+):
     if not channel_uid:
         return ORJSONResponse(
             content={"message": "Channel uid is required to fetch orders"},
@@ -70,23 +105,46 @@ async def fetch_orders(channel_uid: str = None, days_ago: int = 1):
             content={"message": "Channel not found for this uid"},
             status_code=HTTPStatus.BAD_REQUEST,
         )
-    all_orders = []
-    page_token = None
-    while True:
-        response = await Tiktok.get_orders(channel, days_ago, page_token)
-        response = response.json()
-        if response.get("code") != 0:
-            print("Failed to get orders from tiktok server:", response)
-            break
-        orders = response.get("data", {}).get("orders", [])
-        if not orders:
-            print("No more orders found.")
-            break
-        all_orders.extend(orders)
 
-        page_token = response.get("data", {}).get("next_page_token", None)
-        if not page_token:
-            break
+    if stream:
+        return StreamingResponse(
+            stream_orders_ndjson(channel, days_ago), media_type="application/x-ndjson"
+        )
+
+    # Cursor mode, one page per request and the client follows next_page_token.
+    # The window is fixed on the first page and sent back with every cursor.
+    if page_token or page_size:
+        if page_token and create_time_ge is None:
+            return ORJSONResponse(
+                content={"message": "create_time_ge is required with page_token"},
+                status_code=HTTPStatus.BAD_REQUEST,
+            )
+        if create_time_ge is None:
+            create_time_ge = Tiktok.order_window_start(days_ago)
+        response = await Tiktok.get_orders(
+            channel, days_ago, page_token, page_size or 100, create_time_ge
+        )
+        if response.code != 0:
+            return ORJSONResponse(
+                content={"message": "Failed to get orders", "data": response.json()},
+                status_code=HTTPStatus.BAD_REQUEST,
+            )
+        data = response.data
+        return ORJSONResponse(
+            content={
+                "orders": data.get("orders", []),
+                "next_page_token": data.get("next_page_token") or None,
+                "create_time_ge": create_time_ge,
+            },
+            status_code=HTTPStatus.OK,
+        )
+
+    all_orders = []
+    try:
+        async for data in iter_order_pages(channel, days_ago):
+            all_orders.extend(data.get("orders", []))
+    except ValueError:
+        pass
 
     return ORJSONResponse(
         content={"orders": all_orders},
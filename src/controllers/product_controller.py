@@ -1,23 +1,96 @@
 from http import HTTPStatus
+from typing import Any, AsyncIterator, Dict, Iterator
 
+import orjson
 from fastapi import Request
-from fastapi.responses import ORJSONResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
+from models import SyncRun
 from utils.maps import Tiktok
 from utils.helpers import get_channel_and_token
-from tasks.product_tasks import process_all_products
+from tasks.product_tasks import process_all_channels_products, queue_sync_run
 from tasks.inventory_tasks import update_inventory_stock_all_channel
+from utils.sync_runs import (
+    create_sync_batch,
+    get_latest_sync_run,
+    get_sync_batch_progress,
+    get_sync_run,
+    serialize_sync_run,
+    start_or_resume_sync_run,
+)
 
 
-async def fetch_products(channel_uid: str):
+async def fetch_products(channel_uid: str, force: bool = False):
     try:
-        process_all_products.delay(channel_uid=channel_uid)
-        return {"message": "Products are being fetched in the background"}
+        sync_run = await run_in_threadpool(start_or_resume_sync_run, channel_uid, force)
+        if not sync_run:
+            return {"message": "Failed to start product sync"}
+        if sync_run.status != SyncRun.StatusChoices.PENDING:
+            return {
+                "message": "Products of this channel are already being fetched",
+                "sync_run_id": sync_run.id,
+            }
+        await run_in_threadpool(queue_sync_run, channel_uid, sync_run.id, force)
+        return {
+            "message": "Products are being fetched in the background",
+            "sync_run_id": sync_run.id,
+        }
 
     except Exception as e:
         return {"message": "Failed to fetch products", "error": str(e)}
 
 
+async def fetch_products_all_channels(force: bool = False, concurrency: int = None):
+    batch_uid = await run_in_threadpool(create_sync_batch)
+    if not batch_uid:
+        return ORJSONResponse(
+            content={"message": "No channels to sync"},
+            status_code=HTTPStatus.BAD_REQUEST,
+        )
+    process_all_channels_products.delay(
+        force=force, concurrency=concurrency, batch_uid=batch_uid
+    )
+    return ORJSONResponse(
+        content={
+            "message": "Products of all channels are being fetched in the background",
+            "batch_uid": batch_uid,
+        },
+        status_code=HTTPStatus.OK,
+    )
+
+
+async def get_sync_batch(batch_uid: str):
+    progress = await run_in_threadpool(get_sync_batch_progress, batch_uid)
+    if not progress:
+        return ORJSONResponse(
+            content={"message": "Sync batch not found"},
+            status_code=HTTPStatus.NOT_FOUND,
+        )
+    return ORJSONResponse(content=progress, status_code=HTTPStatus.OK)
+
+
+async def get_sync_run_progress(sync_run_id: int = None, channel_uid: str = None):
+    if not sync_run_id and not channel_uid:
+        return ORJSONResponse(
+            content={"message": "sync_run_id or channel_uid is required"},
+            status_code=HTTPStatus.BAD_REQUEST,
+        )
+    sync_run = await (
+        run_in_threadpool(get_sync_run, sync_run_id)
+        if sync_run_id
+        else run_in_threadpool(get_latest_sync_run, channel_uid)
+    )
+    if not sync_run:
+        return ORJSONResponse(
+            content={"message": "Sync run not found"},
+            status_code=HTTPStatus.NOT_FOUND,
+        )
+    return ORJSONResponse(
+        content=serialize_sync_run(sync_run), status_code=HTTPStatus.OK
+    )
+
+
 async def get_product_details(product_id: str, req: Request):
     query_params = req.query_params._dict
     channel_uid = query_params.get("channel_uid", None)
@@ -69,7 +142,7 @@ async def update_product_inventory(product_id: str, req: Request):
         res = await Tiktok.update_product_inventory(
             product_id, channel.access_token, channel.shop_cipher, req_body
         )
-        if res.json().get("code") != 0:
+        if res.code != 0:
             return ORJSONResponse(
                 content={"message": "Failed to update inventory", "data": res.json()},
                 status_code=HTTPStatus.BAD_REQUEST,
@@ -83,7 +156,51 @@ async def update_product_inventory(product_id: str, req: Request):
         )
 
 
-async def get_products_from_tiktok(channel_uid: str = None):
+def flatten_product_skus(product: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    for sku in product.get("skus", []):
+        yield {
+            "id": product.get("id", ""),
+            "sku": sku.get("seller_sku", ""),
+            "sku_id": sku.get("id"),
+            "warehouse_id": sku.get("inventory", [{}])[0].get("warehouse_id", ""),
+            "quantity": sku.get("inventory", [{}])[0].get("quantity", 0),
+            "price": sku.get("price", {}).get("tax_exclusive_price", 0.0),
+        }
+
+
+async def iter_product_pages(channel) -> AsyncIterator[Dict[str, Any]]:
+    """Yield the response data of every product page of the channel."""
+    next_page_token = ""
+    while True:
+        response = await Tiktok.get_products(
+            channel.access_token, channel.shop_cipher, next_page_token
+        )
+        if response.code != 0:
+            raise ValueError(response.message or "Failed to fetch products")
+
+        data = response.data
+        yield data
+        next_page_token = data.get("next_page_token", "")
+        if not next_page_token:
+            break
+
+
+async def stream_products_ndjson(channel) -> AsyncIterator[bytes]:
+    """Send the flattened SKU rows of each page as soon as the page arrives."""
+    try:
+        async for data in iter_product_pages(channel):
+            rows = [
+                orjson.dumps(row)
+                for product in data.get("products", [])
+                for row in flatten_product_skus(product)
+            ]
+            if rows:
+                yield b"\n".join(rows) + b"\n"
+    except Exception as e:
+        yield orjson.dumps({"error": str(e)}) + b"\n"
+
+
+async def get_products_from_tiktok(channel_uid: str = None, stream: bool = False):
     if not channel_uid:
         return ORJSONResponse(
             content={"message": "Channel uid is required"},
@@ -96,40 +213,19 @@ async def get_products_from_tiktok(channel_uid: str = None):
                 content={"message": "Failed to get Channel"},
                 status_code=HTTPStatus.BAD_REQUEST,
             )
-        response = await Tiktok.get_products(channel.access_token, channel.shop_cipher)
+        if stream:
+            return StreamingResponse(
+                stream_products_ndjson(channel), media_type="application/x-ndjson"
+            )
 
-        next_page_token = ""
         all_products = []
-        while True:
-            response = await Tiktok.get_products(
-                channel.access_token, channel.shop_cipher, next_page_token
-            )
-            response = response.json()
-            if response.get("code") != 0:
-                break
-
-            next_page_token = response.get("data", {}).get("next_page_token", "")
-            has_more = bool(next_page_token)
-            for product in response.get("data", {}).get("products", []):
-                for sku in product.get("skus", []):
-                    all_products.append(
-                        {
-                            "id": product.get("id", ""),
-                            "sku": sku.get("seller_sku", ""),
-                            "sku_id": sku.get("id"),
-                            "warehouse_id": sku.get("inventory", [{}])[0].get(
-                                "warehouse_id", ""
-                            ),
-                            "quantity": sku.get("inventory", [{}])[0].get(
-                                "quantity", 0
-                            ),
-                            "price": sku.get("price", {}).get(
-                                "tax_exclusive_price", 0.0
-                            ),
-                        }
-                    )
-            if not has_more:
-                break
+        try:
+            async for data in iter_product_pages(channel):
+                for product in data.get("products", []):
+                    all_products.extend(flatten_product_skus(product))
+        except ValueError:
+            # Keep the pages fetched before the failure, as before
+            pass
 
         return ORJSONResponse(
             content={
@@ -1,8 +1,74 @@
+import asyncio
+import logging as log
+from typing import Any, Dict
+
+from starlette.concurrency import run_in_threadpool
+
 from serializers.webhook_serializer import Notification
-from tasks import process_webhook_data
+from config.app_vars import WEBHOOK_SPOOL_DRAIN_INTERVAL
+from tasks.webhook_tasks import (
+    dispatch_raw_webhook,
+    dispatch_webhook,
+    replay_spooled_webhooks,
+    webhook_spool,
+)
+from utils.idempotency import is_duplicate_notification, release_notification
 
 
 async def process_webhook_request(payload: Notification):
-    print("webhook payload:", payload)
-    process_webhook_data.delay(payload.model_dump())
+    log.debug(f"webhook payload: {payload}")
+    if await run_in_threadpool(
+        is_duplicate_notification,
+        payload.tts_notification_id,
+        payload.shop_id,
+        payload.type,
+    ):
+        return {"message": "Duplicate webhook request ignored"}
+    try:
+        dispatched = await run_in_threadpool(dispatch_webhook, payload.model_dump())
+    except Exception:
+        # Not queued, the redelivery must not be taken for a duplicate
+        await run_in_threadpool(release_notification, payload.tts_notification_id)
+        raise
+    if not dispatched:
+        return {"message": "Webhook type is not handled"}
+    return {"message": "Webhook request received successfully"}
+
+
+async def process_raw_webhook_request(payload: Dict[str, Any]):
+    """
+    Fast ingest: dedup and forward the decoded body, the worker validates it.
+
+    The dedup insert and, for orders, the coalescing upsert are still database
+    writes made in the request, on the threadpool.
+    """
+    if await run_in_threadpool(
+        is_duplicate_notification,
+        payload["tts_notification_id"],
+        payload["shop_id"],
+        payload["type"],
+    ):
+        return {"message": "Duplicate webhook request ignored"}
+    try:
+        dispatched = await run_in_threadpool(dispatch_raw_webhook, payload)
+    except Exception:
+        await run_in_threadpool(release_notification, payload["tts_notification_id"])
+        raise
+    if not dispatched:
+        return {"message": "Webhook type is not handled"}
     return {"message": "Webhook request received successfully"}
+
+
+async def drain_webhook_spool():
+    """Replay webhooks spooled while the broker was down, runs for the app lifetime."""
+    while True:
+        try:
+            if webhook_spool.has_pending():
+                replayed = await run_in_threadpool(
+                    webhook_spool.drain, replay_spooled_webhooks
+                )
+                if replayed:
+                    log.info(f"Replayed {replayed} spooled webhooks to the broker")
+        except Exception as e:
+            log.error(f"Error draining webhook spool: {e}")
+        await asyncio.sleep(WEBHOOK_SPOOL_DRAIN_INTERVAL)
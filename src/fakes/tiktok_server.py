@@ -0,0 +1,461 @@
+"""
+Fake TikTok Shop API for load tests of the sync, order and inventory paths.
+
+Run it from the `src` folder and point the client at it:
+
+    python -m fakes.tiktok_server
+    TIKTOK_OPEN_API_URL=http://localhost:9100 TIKTOK_AUTH_URL=http://localhost:9100
+
+It serves the endpoints of utils/tiktok_client.ENDPOINTS with a generated
+catalogue of FAKE_TIKTOK_PRODUCTS products and FAKE_TIKTOK_ORDERS orders (the
+same for every shop, reproducible with FAKE_TIKTOK_SEED), and simulates
+latency, failures and throttling. Error codes are the HTTP status of the
+simulated failure, TikTok's own codes are not reproduced. GET /fake/stats
+returns the request counts per endpoint.
+"""
+
+import asyncio
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import orjson
+import uvicorn
+from fastapi import APIRouter, Depends, FastAPI, Request
+from fastapi.responses import ORJSONResponse
+
+from config.app_vars import (
+    APP_KEY,
+    APP_SECRET,
+    FAKE_TIKTOK_ERROR_RATE,
+    FAKE_TIKTOK_LATENCY_JITTER_MS,
+    FAKE_TIKTOK_LATENCY_MS,
+    FAKE_TIKTOK_ORDERS,
+    FAKE_TIKTOK_PORT,
+    FAKE_TIKTOK_PRODUCTS,
+    FAKE_TIKTOK_RATE_LIMIT,
+    FAKE_TIKTOK_SEED,
+    FAKE_TIKTOK_VERIFY_SIGNATURE,
+)
+from utils.signing import sign_request
+
+SHOP_ID = "7494000000000000001"
+SHOP_CIPHER = "FAKE_SHOP_CIPHER"
+WAREHOUSE_ID = "7494000000000000002"
+DELIVERY_OPTION_ID = "7494000000000000003"
+PRODUCT_ID_BASE = 1729000000000000000
+SKU_ID_BASE = 1729500000000000000
+ORDER_ID_BASE = 576400000000000000
+PACKAGE_ID_BASE = 1152000000000000000
+# Orders are spread over this many days before the server started
+ORDER_DAYS = 30
+ORDER_STATUSES = ["AWAITING_SHIPMENT", "AWAITING_COLLECTION", "IN_TRANSIT", "COMPLETED"]
+SHIPPING_PROVIDERS = [
+    {"id": "7494000000000000101", "name": "Royal Mail"},
+    {"id": "7494000000000000102", "name": "Evri"},
+    {"id": "7494000000000000103", "name": "DPD"},
+]
+
+started_at = int(time.time())
+# Inventory and shipping writes, the generated catalogue is never stored
+inventory: Dict[str, int] = {}
+packages: Dict[str, Dict[str, Any]] = {}
+stats: Dict[str, Dict[str, int]] = defaultdict(
+    lambda: {"requests": 0, "errors": 0, "throttled": 0}
+)
+_buckets: Dict[str, tuple] = {}
+_lock = threading.Lock()
+
+
+class FakeError(Exception):
+    def __init__(self, status: int, message: str):
+        self.status = status
+        self.message = message
+
+
+def tiktok_response(data: Any = None, code: int = 0, message: str = "Success"):
+    return {
+        "code": code,
+        "message": message,
+        "request_id": uuid.uuid4().hex,
+        "data": data if data is not None else {},
+    }
+
+
+# Catalogue
+
+
+def _rng(kind: int, index: int) -> random.Random:
+    return random.Random(f"{FAKE_TIKTOK_SEED}:{kind}:{index}")
+
+
+def _index(value: str, base: int, size: int) -> int:
+    try:
+        index = int(value) - base
+    except (TypeError, ValueError):
+        index = -1
+    if not 0 <= index < size:
+        raise FakeError(404, f"{value} does not exist")
+    return index
+
+
+def make_product(index: int) -> Dict[str, Any]:
+    rng = _rng(1, index)
+    product_id = str(PRODUCT_ID_BASE + index)
+    skus = []
+    for n in range(rng.randint(1, 3)):
+        sku_id = str(SKU_ID_BASE + index * 10 + n)
+        price = f"{rng.randint(199, 9999) / 100:.2f}"
+        skus.append(
+            {
+                "id": sku_id,
+                "seller_sku": f"FAKE-{index:07d}-{n}",
+                "price": {
+                    "currency": "GBP",
+                    "sale_price": price,
+                    "tax_exclusive_price": price,
+                },
+                "inventory": [
+                    {
+                        "warehouse_id": WAREHOUSE_ID,
+                        "quantity": inventory.get(sku_id, rng.randint(0, 500)),
+                    }
+                ],
+            }
+        )
+    return {
+        "id": product_id,
+        "title": f"Fake product {index}",
+        "description": f"<p>Generated product {index}</p>",
+        "status": "ACTIVATE",
+        "main_images": [{"urls": [f"https://example.com/fake/{product_id}.jpg"]}],
+        "skus": skus,
+        "create_time": started_at - index * 60,
+        "update_time": started_at,
+    }
+
+
+def order_create_time(index: int) -> int:
+    # Newest first, so a create_time_ge filter is a prefix of the orders
+    return started_at - index * ORDER_DAYS * 24 * 60 * 60 // max(FAKE_TIKTOK_ORDERS, 1)
+
+
+def make_order(index: int) -> Dict[str, Any]:
+    rng = _rng(2, index)
+    order_id = str(ORDER_ID_BASE + index)
+    package_id = str(PACKAGE_ID_BASE + index)
+    create_time = order_create_time(index)
+    line_items, total = [], 0.0
+    for n in range(rng.randint(1, 3)):
+        product = make_product(rng.randrange(max(FAKE_TIKTOK_PRODUCTS, 1)))
+        sku = product["skus"][0]
+        total += float(sku["price"]["sale_price"])
+        line_items.append(
+            {
+                "id": f"{order_id}{n}",
+                "product_id": product["id"],
+                "product_name": product["title"],
+                "sku_id": sku["id"],
+                "seller_sku": sku["seller_sku"],
+                "sale_price": sku["price"]["sale_price"],
+                "original_price": sku["price"]["sale_price"],
+                "currency": "GBP",
+                "package_id": package_id,
+                "display_status": "AWAITING_SHIPMENT",
+            }
+        )
+    return {
+        "id": order_id,
+        "status": rng.choice(ORDER_STATUSES),
+        "create_time": create_time,
+        "update_time": create_time + 600,
+        "paid_time": create_time + 60,
+        "buyer_email": f"buyer{index}@example.com",
+        "delivery_option_id": DELIVERY_OPTION_ID,
+        "delivery_option_name": "Standard shipping",
+        "payment_method_name": "Card",
+        "line_items": line_items,
+        "packages": [{"id": package_id}],
+        "payment": {
+            "currency": "GBP",
+            "total_amount": f"{total:.2f}",
+            "sub_total": f"{total:.2f}",
+            "original_total_product_price": f"{total:.2f}",
+            "original_shipping_fee": "0.00",
+            "shipping_fee": "0.00",
+        },
+        "recipient_address": {
+            "first_name": "Fake",
+            "last_name": f"Buyer {index}",
+            "name": f"Fake Buyer {index}",
+            "address_line1": f"{index % 200 + 1} Test Street",
+            "address_line2": "",
+            "postal_code": "EC1A 1BB",
+            "region_code": "GB",
+            "phone_number": "(+44)7700900000",
+            "district_info": [
+                {
+                    "address_level": "L0",
+                    "address_level_name": "Country",
+                    "address_name": "United Kingdom",
+                }
+            ],
+        },
+    }
+
+
+def paginate(total: int, page_size: Optional[str], page_token: Optional[str]):
+    size = min(max(int(page_size or 10), 1), 100)
+    start = int(page_token or 0)
+    end = min(start + size, total)
+    return range(start, end), (str(end) if end < total else "")
+
+
+# Latency, failures, throttling and signatures, applied to every API route
+
+
+def _throttled(shop: str) -> bool:
+    rate = FAKE_TIKTOK_RATE_LIMIT
+    with _lock:
+        now = time.monotonic()
+        tokens, updated = _buckets.get(shop, (rate, now))
+        tokens = min(rate, tokens + (now - updated) * rate)
+        if tokens < 1:
+            _buckets[shop] = (tokens, now)
+            return True
+        _buckets[shop] = (tokens - 1, now)
+        return False
+
+
+async def simulate(request: Request):
+    route = request.scope["route"].path
+    stats[route]["requests"] += 1
+    jitter = random.uniform(
+        -FAKE_TIKTOK_LATENCY_JITTER_MS, FAKE_TIKTOK_LATENCY_JITTER_MS
+    )
+    await asyncio.sleep(max(FAKE_TIKTOK_LATENCY_MS + jitter, 0) / 1000)
+
+    params: Dict[str, Any] = {}
+    for key, value in request.query_params.multi_items():
+        params[key] = [*params[key], value] if key in params else value
+    params = {
+        key: value if not isinstance(value, list) or len(value) > 1 else value[0]
+        for key, value in params.items()
+    }
+    if APP_KEY and params.get("app_key") != APP_KEY:
+        raise FakeError(401, "Invalid app_key")
+    if FAKE_TIKTOK_VERIFY_SIGNATURE and not route.startswith("/api/v2/token"):
+        body = await request.body()
+        sign = params.pop("sign", "")
+        if sign != sign_request(request.url.path, params, body or None, APP_SECRET):
+            raise FakeError(401, "Invalid signature")
+
+    if FAKE_TIKTOK_RATE_LIMIT and _throttled(params.get("shop_cipher", "")):
+        stats[route]["throttled"] += 1
+        raise FakeError(429, "Too many requests")
+    if random.random() < FAKE_TIKTOK_ERROR_RATE:
+        stats[route]["errors"] += 1
+        raise FakeError(500, "Simulated internal error")
+
+
+async def json_body(request: Request) -> Dict[str, Any]:
+    body = await request.body()
+    return orjson.loads(body) if body else {}
+
+
+api = APIRouter(dependencies=[Depends(simulate)])
+
+
+# Auth
+
+
+def token_data() -> Dict[str, Any]:
+    now = int(time.time())
+    return {
+        "access_token": f"FAKE_ACCESS_{uuid.uuid4().hex}",
+        "refresh_token": f"FAKE_REFRESH_{uuid.uuid4().hex}",
+        "access_token_expire_in": now + 7 * 24 * 60 * 60,
+        "refresh_token_expire_in": now + 365 * 24 * 60 * 60,
+        "open_id": "fake-open-id",
+        "seller_name": "Fake seller",
+    }
+
+
+@api.get("/api/v2/token/get")
+async def get_access_token():
+    return tiktok_response(token_data())
+
+
+@api.get("/api/v2/token/refresh")
+async def refresh_access_token():
+    return tiktok_response(token_data())
+
+
+# Shops
+
+
+@api.get("/authorization/202309/shops")
+async def get_authorized_shops():
+    shop = {"id": SHOP_ID, "cipher": SHOP_CIPHER, "name": "Fake shop", "region": "GB"}
+    return tiktok_response({"shops": [shop]})
+
+
+@api.get("/seller/202309/shops")
+async def get_active_shops():
+    return tiktok_response({"shops": [{"id": SHOP_ID, "region": "GB"}]})
+
+
+# Orders
+
+
+@api.get("/order/202309/orders")
+async def get_order_details(request: Request):
+    ids: List[str] = request.query_params.getlist("ids")
+    orders = [
+        make_order(_index(order_id, ORDER_ID_BASE, FAKE_TIKTOK_ORDERS))
+        for order_id in ids
+    ]
+    return tiktok_response({"orders": orders})
+
+
+@api.post("/order/202309/orders/search")
+async def search_orders(request: Request):
+    body = await json_body(request)
+    create_time_ge = int(body.get("create_time_ge") or 0)
+    # Binary search of the last order created at or after create_time_ge
+    low, high = 0, FAKE_TIKTOK_ORDERS
+    while low < high:
+        middle = (low + high) // 2
+        if order_create_time(middle) >= create_time_ge:
+            low = middle + 1
+        else:
+            high = middle
+    indexes, next_page_token = paginate(
+        low,
+        request.query_params.get("page_size"),
+        request.query_params.get("page_token") or body.get("page_token"),
+    )
+    return tiktok_response(
+        {
+            "orders": [make_order(index) for index in indexes],
+            "next_page_token": next_page_token,
+            "total_count": low,
+        }
+    )
+
+
+# Products
+
+
+@api.get("/product/202309/products/{product_id}")
+async def get_product(product_id: str):
+    return tiktok_response(
+        make_product(_index(product_id, PRODUCT_ID_BASE, FAKE_TIKTOK_PRODUCTS))
+    )
+
+
+@api.post("/product/202309/products/search")
+async def search_products(request: Request):
+    indexes, next_page_token = paginate(
+        FAKE_TIKTOK_PRODUCTS,
+        request.query_params.get("page_size"),
+        request.query_params.get("page_token"),
+    )
+    return tiktok_response(
+        {
+            "products": [make_product(index) for index in indexes],
+            "next_page_token": next_page_token,
+            "total_count": FAKE_TIKTOK_PRODUCTS,
+        }
+    )
+
+
+@api.post("/product/202309/products/{product_id}/inventory/update")
+async def update_inventory(product_id: str, request: Request):
+    product = make_product(_index(product_id, PRODUCT_ID_BASE, FAKE_TIKTOK_PRODUCTS))
+    sku_ids = {sku["id"] for sku in product["skus"]}
+    body = await json_body(request)
+    for sku in body.get("skus", []):
+        if sku.get("id") not in sku_ids:
+            raise FakeError(404, f"SKU {sku.get('id')} is not in product {product_id}")
+        inventory[sku["id"]] = sum(
+            int(item.get("quantity", 0)) for item in sku.get("inventory", [])
+        )
+    return tiktok_response()
+
+
+# Logistics and fulfillment
+
+
+@api.get("/logistics/202309/delivery_options/{delivery_option_id}/shipping_providers")
+async def get_shipping_providers(delivery_option_id: str):
+    return tiktok_response({"shipping_providers": SHIPPING_PROVIDERS})
+
+
+@api.get("/fulfillment/202309/packages/{package_id}")
+async def get_package(package_id: str):
+    index = _index(package_id, PACKAGE_ID_BASE, FAKE_TIKTOK_ORDERS)
+    shipment = packages.get(package_id, {})
+    return tiktok_response(
+        {
+            "package_id": package_id,
+            "package_status": "IN_TRANSIT" if shipment else "PROCESSING",
+            "orders": [{"id": str(ORDER_ID_BASE + index)}],
+            **shipment,
+        }
+    )
+
+
+@api.post("/fulfillment/202309/orders/{order_id}/packages")
+async def ship_package(order_id: str, request: Request):
+    index = _index(order_id, ORDER_ID_BASE, FAKE_TIKTOK_ORDERS)
+    package_id = str(PACKAGE_ID_BASE + index)
+    body = await json_body(request)
+    packages[package_id] = {
+        "shipping_provider_id": body.get("shipping_provider_id", ""),
+        "tracking_number": body.get("tracking_number", ""),
+    }
+    return tiktok_response({"package_id": package_id})
+
+
+@api.post("/fulfillment/202309/packages/{package_id}/shipping_info/update")
+async def update_shipping_info(package_id: str, request: Request):
+    _index(package_id, PACKAGE_ID_BASE, FAKE_TIKTOK_ORDERS)
+    body = await json_body(request)
+    packages[package_id] = {
+        "shipping_provider_id": body.get("shipping_provider_id", ""),
+        "tracking_number": body.get("tracking_number", ""),
+    }
+    return tiktok_response()
+
+
+app = FastAPI(title="Fake TikTok Shop", default_response_class=ORJSONResponse)
+app.include_router(api)
+
+
+@app.exception_handler(FakeError)
+async def fake_error_handler(request: Request, exc: FakeError):
+    return ORJSONResponse(
+        content=tiktok_response(code=exc.status, message=exc.message),
+        status_code=exc.status,
+    )
+
+
+@app.get("/fake/stats")
+async def get_stats():
+    return {"requests": stats, "inventory_updates": len(inventory)}
+
+
+@app.post("/fake/reset")
+async def reset():
+    inventory.clear()
+    packages.clear()
+    stats.clear()
+    return {"reset": True}
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="0.0.0.0", port=FAKE_TIKTOK_PORT)
@@ -1,11 +1,15 @@
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from http import HTTPStatus
 
-from fastapi import Depends, FastAPI
+from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse
 from starlette.middleware.cors import CORSMiddleware
 
-from config.database import Session, get_db
+from config.database import get_pool_stats, ping_database
+from controllers.webhook_controller import drain_webhook_spool
+from utils.tiktok_client import tiktok_client
 from routers import (
     auth_router,
     order_router,
@@ -15,7 +19,16 @@ from routers import (
 )
 
 logger = logging.getLogger("fastapi")
-app = FastAPI(dependencies=[Depends(get_db)])
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    spool_drainer = asyncio.create_task(drain_webhook_spool())
+    yield
+    spool_drainer.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # logger.addHandler(logging.StreamHandler())
 # logger.setLevel(logging.DEBUG)
@@ -29,12 +42,12 @@ app.add_middleware(
 
 
 @app.get("/")
-def health_check():
-    db = Session()
-
+async def health_check():
     resp = {}
     resp["server_health"] = "MYE TikTok Service API health OK"
-    resp["database_health"] = "OK" if db.is_active else "disconnected"
+    resp["database_health"] = "OK" if await ping_database() else "disconnected"
+    resp["database_pools"] = get_pool_stats()
+    resp["tiktok_api"] = tiktok_client.stats.snapshot()
 
     return ORJSONResponse(content=resp, status_code=HTTPStatus.OK)
 
@@ -1,2 +1,6 @@
 from .channel import Channel
 from .inventoryrequest import InventoryRequest
+from .orderwebhookstate import OrderWebhookState
+from .productfingerprint import ProductFingerprint
+from .syncrun import SyncRun
+from .webhooknotification import WebhookNotification
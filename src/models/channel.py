@@ -30,7 +30,7 @@ class Channel(Base):
     company_uuid = Column(String(64))
     name = Column(String(128), nullable=False)
     country = Column(String(128))
-    shop_id = Column(BigInteger, nullable=False)
+    shop_id = Column(BigInteger, nullable=False, index=True, unique=True)
     shop_cipher = Column(String, unique=True)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
@@ -49,3 +49,4 @@ class Channel(Base):
     inventoryrequests = relationship(
         "InventoryRequest", back_populates="channelInventoryRef"
     )
+    syncruns = relationship("SyncRun", back_populates="channelSyncRunRef")
@@ -0,0 +1,16 @@
+from sqlalchemy import BigInteger, Column, DateTime, String
+from sqlalchemy.sql import func
+
+from config.database import Base
+
+
+class OrderWebhookState(Base):
+    """Newest order status webhook seen per order, used to coalesce bursts."""
+
+    __tablename__ = "orderwebhookstates"
+
+    order_id = Column(String(64), primary_key=True, nullable=False)
+    shop_id = Column(String(32))
+    update_time = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), index=True)
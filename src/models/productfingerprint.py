@@ -0,0 +1,16 @@
+from sqlalchemy import Column, DateTime, String
+from sqlalchemy.sql import func
+
+from config.database import Base
+
+
+class ProductFingerprint(Base):
+    """Last content hash of a product that was pushed to MIAMS for a channel."""
+
+    __tablename__ = "productfingerprints"
+
+    channel_uid = Column(String(32), primary_key=True, nullable=False)
+    product_id = Column(String(64), primary_key=True, nullable=False)
+    content_hash = Column(String(64), nullable=False)
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
@@ -0,0 +1,24 @@
+"""
+Hot statements of the channel and inventory lookups, shared by the sync and
+async sessions. psycopg prepares them on the server once they ran
+DB_PREPARE_THRESHOLD times on a connection.
+"""
+
+from sqlalchemy import bindparam, select
+
+from .channel import Channel
+from .inventoryrequest import InventoryRequest
+
+CHANNEL_BY_UID = select(Channel).where(Channel.channel_uid == bindparam("channel_uid"))
+
+CHANNEL_BY_SHOP_ID = select(Channel).where(Channel.shop_id == bindparam("shop_id"))
+
+PENDING_INVENTORY_REQUESTS = (
+    select(InventoryRequest)
+    .where(
+        InventoryRequest.channel_uid == bindparam("channel_uid"),
+        InventoryRequest.status == InventoryRequest.StatusChoices.PENDING,
+        InventoryRequest.created_at >= bindparam("since"),
+    )
+    .order_by(InventoryRequest.created_at.asc())
+)
@@ -0,0 +1,42 @@
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+
+from config.database import Base
+
+
+class SyncRun(Base):
+    __tablename__ = "syncruns"
+
+    id = Column(
+        BigInteger,
+        nullable=False,
+        primary_key=True,
+        index=True,
+        unique=True,
+        autoincrement="auto",
+    )
+    channel_uid = Column(String(32), ForeignKey("channels.channel_uid"), index=True)
+    batch_uid = Column(String(32), nullable=True, index=True)
+    # Celery task id of the worker driving the run, see claim_sync_run
+    task_id = Column(String(64), nullable=True)
+    status = Column(String(16), nullable=False, default="RUNNING")
+    next_page_token = Column(String(512), nullable=True)
+    pages = Column(Integer, nullable=False, default=0)
+    total_products = Column(Integer, nullable=False, default=0)
+    skipped_products = Column(Integer, nullable=False, default=0)
+    error = Column(String(512), nullable=True)
+    started_at = Column(DateTime, default=func.now())
+    finished_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    channelSyncRunRef = relationship("Channel", back_populates="syncruns")
+
+    class StatusChoices:
+        PENDING = "PENDING"
+        # Dispatched to a worker that has not claimed it yet
+        QUEUED = "QUEUED"
+        RUNNING = "RUNNING"
+        COMPLETED = "COMPLETED"
+        FAILED = "FAILED"
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy.sql import func
+
+from config.database import Base
+
+
+class WebhookNotification(Base):
+    """TikTok notification ids already accepted, used to drop redeliveries."""
+
+    __tablename__ = "webhooknotifications"
+
+    tts_notification_id = Column(String(64), primary_key=True, nullable=False)
+    shop_id = Column(String(32))
+    type = Column(Integer)
+    created_at = Column(DateTime, default=func.now(), index=True)
@@ -1,2 +1,3 @@
-from .product_publisher import publish_product_in_queue
-from .order_publisher import publish_order_in_queue
\ No newline at end of file
+from .pool import publisher_pool
+from .product_publisher import publish_product_in_queue, product_buffer
+from .order_publisher import publish_order_in_queue
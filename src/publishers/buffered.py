@@ -0,0 +1,133 @@
+import gzip
+import json
+import logging as log
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+
+from kombu import Exchange
+
+from config.app_vars import PUBLISH_BATCH_COMPRESS, PUBLISH_BATCH_MAX_BYTES
+from publishers.pool import publisher_pool
+
+
+class BufferedPublisher:
+    """
+    Packs records into `{envelope: [record, ...]}` messages of at most
+    `max_bytes` before compression.
+
+    Records are only collected inside `batch()` and are published, all
+    confirmed by the broker together, before the block ends. A task therefore
+    never returns, and gets acked, with records still in memory. Each thread
+    has its own buffer, so the tasks of a thread pool do not mix their records.
+    """
+
+    def __init__(
+        self,
+        exchange: Exchange,
+        routing_key: str,
+        envelope: str,
+        max_bytes: int = PUBLISH_BATCH_MAX_BYTES,
+        compress: bool = PUBLISH_BATCH_COMPRESS,
+    ):
+        self.exchange = exchange
+        self.routing_key = routing_key
+        self.envelope = envelope
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self._local = threading.local()
+
+    def _state(self) -> threading.local:
+        """Buffer of this thread, created on first use."""
+        if not hasattr(self._local, "records"):
+            self._local.records, self._local.size, self._local.depth = [], 0, 0
+            self._local.callbacks = []
+        return self._local
+
+    @property
+    def _records(self) -> List[str]:
+        return self._state().records
+
+    def _reset(self):
+        self._local.records.clear()
+        self._local.callbacks.clear()
+        self._local.size = 0
+
+    @contextmanager
+    def batch(self) -> Iterator["BufferedPublisher"]:
+        """
+        Collect the records added in the block and publish them when it ends.
+
+        The records are dropped when the block raises, or when publishing them
+        fails, which raises too: the task is retried and adds them again.
+        Nested blocks publish with the outermost one.
+        """
+        if not self._state().depth:
+            self._reset()
+        self._local.depth += 1
+        try:
+            yield self
+            if self._local.depth == 1:
+                self.flush()
+                for callback in self._local.callbacks:
+                    callback()
+        finally:
+            self._local.depth -= 1
+            if not self._local.depth:
+                self._reset()
+
+    def on_published(self, callback: Callable[[], Any]):
+        """Run `callback` once every record of the current batch is confirmed."""
+        if not self._state().depth:
+            raise RuntimeError(f"{self.envelope} callbacks must be added in batch()")
+        self._local.callbacks.append(callback)
+
+    def add(self, record: Dict[str, Any]):
+        self.extend([record])
+
+    def extend(self, records: Iterable[Dict[str, Any]]):
+        buffered = self._records
+        if not self._local.depth:
+            raise RuntimeError(f"{self.envelope} records must be added in batch()")
+        for record in records:
+            encoded = json.dumps(record)
+            buffered.append(encoded)
+            self._local.size += len(encoded) + 1
+            # Never hold more than one message worth of records
+            if self._local.size >= self.max_bytes:
+                self.flush()
+
+    def _pack(self, records: List[str]) -> List[bytes]:
+        """Split the encoded records in envelopes of at most `max_bytes`."""
+        prefix = f'{{"{self.envelope}": ['.encode()
+        messages, batch, size = [], [], 0
+        for record in records:
+            if batch and size + len(record) + 1 > self.max_bytes:
+                messages.append(prefix + ",".join(batch).encode() + b"]}")
+                batch, size = [], 0
+            batch.append(record)
+            size += len(record) + 1
+        if batch:
+            messages.append(prefix + ",".join(batch).encode() + b"]}")
+        if self.compress:
+            messages = [gzip.compress(message) for message in messages]
+        return messages
+
+    def flush(self) -> int:
+        records = list(self._records)
+        self._records.clear()
+        self._local.size = 0
+        if not records:
+            return 0
+        try:
+            publisher_pool.publish_bodies(
+                self.exchange,
+                self.routing_key,
+                self._pack(records),
+                content_encoding="gzip" if self.compress else "utf-8",
+            )
+        except Exception as e:
+            log.error(f"Failed to publish {len(records)} {self.envelope}: {e}")
+            raise
+        log.info(f"Published {len(records)} {self.envelope} records")
+        return len(records)
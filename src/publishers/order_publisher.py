@@ -1,8 +1,8 @@
 from typing import Dict, Any
 import logging as log
-import json
-from kombu import Connection, Exchange, Queue, Producer
-from config.app_vars import RABBIT_URL, ORDER_EXCHANGE_NAME, ORDER_QUEUE_NAME
+from kombu import Exchange, Queue
+from config.app_vars import ORDER_EXCHANGE_NAME, ORDER_QUEUE_NAME
+from publishers.pool import publisher_pool
 
 # Order Queue Names
 ORDER_CREATION_DL_QUEUE = "order.creation.deadletter"
@@ -26,25 +26,15 @@ order_queue = Queue(
     },
 )
 
+publisher_pool.declare(order_exchange, order_queue)
+
 
 def publish_order_in_queue(payload: Dict[str, Any]) -> bool:
     """Publish order data to RabbitMQ"""
     try:
-        with Connection(RABBIT_URL) as conn:
-            producer = Producer(
-                conn,
-                exchange=order_exchange,
-                routing_key=ORDER_CREATION_ROUTING_KEY,
-            )
-            producer.publish(
-                json.dumps(payload),
-                content_type="application/json",
-                delivery_mode=2,  # persistent
-                declare=[order_exchange, order_queue],  # auto-declare if not already
-                retry=True,
-            )
-            log.info("Order data published to RabbitMQ")
-            return True
+        publisher_pool.publish(order_exchange, ORDER_CREATION_ROUTING_KEY, payload)
+        log.info("Order data published to RabbitMQ")
+        return True
     except Exception as e:
         log.error(f"Failed to publish order to RabbitMQ: {str(e)}", exc_info=True)
         return False
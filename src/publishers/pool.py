@@ -0,0 +1,190 @@
+import json
+import logging as log
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Union
+
+from amqp import spec
+from amqp.exceptions import MessageNacked
+from kombu import Connection, Exchange, Producer
+
+from config.app_vars import PUBLISHER_CONFIRM_TIMEOUT, PUBLISHER_POOL_SIZE, RABBIT_URL
+
+
+class ConfirmPublisher:
+    """
+    A long-lived connection with one channel in publisher confirm mode.
+
+    Messages are published without waiting and confirmed together, so a batch
+    costs a single confirm round trip. Used by one thread at a time.
+    """
+
+    def __init__(self, url: str, declarations: List, confirm_timeout: float):
+        self.url = url
+        self.declarations = declarations
+        self.confirm_timeout = confirm_timeout
+        self.connection = None
+        self.channel = None
+        self.producer = None
+        self._seq = 0
+        self._unconfirmed = set()
+        self._nacked = 0
+
+    def _connect(self):
+        self.connection = Connection(self.url)
+        self.connection.ensure_connection(max_retries=3)
+        self.channel = self.connection.channel()
+        self.channel.confirm_select()
+        self.channel.events["basic_ack"].add(self._on_ack)
+        self.channel.events["basic_nack"].add(self._on_nack)
+        self.producer = Producer(self.channel)
+        self._seq = 0
+        self._unconfirmed = set()
+        # Exchanges and queues are declared once per connection
+        for entity in self.declarations:
+            entity(self.channel).declare()
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.release()
+            except Exception:
+                pass
+        self.connection = self.channel = self.producer = None
+
+    def _settle(self, delivery_tag: int, multiple: bool):
+        if multiple:
+            self._unconfirmed = {t for t in self._unconfirmed if t > delivery_tag}
+        else:
+            self._unconfirmed.discard(delivery_tag)
+
+    def _on_ack(self, delivery_tag, multiple):
+        self._settle(delivery_tag, multiple)
+
+    def _on_nack(self, delivery_tag, multiple):
+        before = len(self._unconfirmed)
+        self._settle(delivery_tag, multiple)
+        self._nacked += before - len(self._unconfirmed)
+
+    def publish_many(
+        self,
+        exchange: Exchange,
+        routing_key: str,
+        bodies: Iterable[Union[str, bytes]],
+        content_encoding: str = None,
+    ) -> int:
+        if self.channel is None:
+            self._connect()
+        self._nacked = 0
+        published = 0
+        for body in bodies:
+            self.producer.publish(
+                body,
+                exchange=exchange,
+                routing_key=routing_key,
+                content_type="application/json",
+                content_encoding=content_encoding,
+                delivery_mode=2,  # persistent
+            )
+            self._seq += 1
+            self._unconfirmed.add(self._seq)
+            published += 1
+
+        while self._unconfirmed:
+            self.channel.wait(
+                [spec.Basic.Ack, spec.Basic.Nack], timeout=self.confirm_timeout
+            )
+        if self._nacked:
+            raise MessageNacked(f"{self._nacked} of {published} messages were nacked")
+        return published
+
+
+class PublisherPool:
+    """Process wide pool of confirm mode publishers."""
+
+    def __init__(
+        self, url: str = RABBIT_URL, size: int = 4, confirm_timeout: float = 10
+    ):
+        self.url = url
+        self.size = size
+        self.confirm_timeout = confirm_timeout
+        self._declarations = []
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._created = 0
+
+    def declare(self, *entities):
+        """Register exchanges and queues to declare on every new connection."""
+        self._declarations.extend(entities)
+
+    @contextmanager
+    def acquire(self):
+        with self._lock:
+            # A forked process must not share its parent's sockets
+            if self._pid != os.getpid():
+                self._reset()
+            try:
+                publisher = self._idle.get_nowait()
+            except queue.Empty:
+                publisher = None
+                if self._created < self.size:
+                    self._created += 1
+                    publisher = ConfirmPublisher(
+                        self.url, self._declarations, self.confirm_timeout
+                    )
+        if publisher is None:
+            publisher = self._idle.get()
+        try:
+            yield publisher
+        finally:
+            self._idle.put(publisher)
+
+    def publish_many(
+        self, exchange: Exchange, routing_key: str, payloads: List[Dict[str, Any]]
+    ) -> int:
+        """
+        Publish `payloads` as one message each and wait for all confirms at once.
+
+        Raises when the broker nacked a message or the connection failed twice;
+        messages of a failed attempt are published again on the retry.
+        """
+        bodies = [json.dumps(payload) for payload in payloads]
+        return self.publish_bodies(exchange, routing_key, bodies)
+
+    def publish_bodies(
+        self,
+        exchange: Exchange,
+        routing_key: str,
+        bodies: List[Union[str, bytes]],
+        content_encoding: str = None,
+    ) -> int:
+        """Same as `publish_many` for bodies that are already serialized."""
+        with self.acquire() as publisher:
+            for attempt in range(2):
+                try:
+                    return publisher.publish_many(
+                        exchange, routing_key, bodies, content_encoding
+                    )
+                except MessageNacked:
+                    raise
+                except Exception as e:
+                    publisher.close()
+                    if attempt:
+                        raise
+                    log.warning(f"Publish failed, reconnecting: {e}")
+
+    def publish(
+        self, exchange: Exchange, routing_key: str, payload: Dict[str, Any]
+    ) -> int:
+        return self.publish_many(exchange, routing_key, [payload])
+
+
+publisher_pool = PublisherPool(
+    size=PUBLISHER_POOL_SIZE, confirm_timeout=PUBLISHER_CONFIRM_TIMEOUT
+)
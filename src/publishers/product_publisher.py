@@ -1,8 +1,9 @@
 from typing import Dict, Any
 import logging as log
-import json
-from kombu import Connection, Exchange, Queue, Producer
-from config.app_vars import RABBIT_URL, PRODUCT_EXCHANGE_NAME, PRODUCT_QUEUE_NAME
+from kombu import Exchange, Queue
+from config.app_vars import PRODUCT_EXCHANGE_NAME, PRODUCT_QUEUE_NAME
+from publishers.buffered import BufferedPublisher
+from publishers.pool import publisher_pool
 
 # Product Queue Names
 PRODUCT_CREATION_ROUTING_KEY = "order.creation"
@@ -25,28 +26,20 @@ product_queue = Queue(
     },
 )
 
+publisher_pool.declare(product_exchange, product_queue)
+
+# Packs many products into one {"Products": [...]} message
+product_buffer = BufferedPublisher(
+    product_exchange, PRODUCT_CREATION_ROUTING_KEY, "Products"
+)
+
 
 def publish_product_in_queue(payload: Dict[str, Any]) -> bool:
     """Publish product data to RabbitMQ"""
     try:
-        with Connection(RABBIT_URL) as conn:
-            # Create producer
-            producer = Producer(
-                conn,
-                exchange=product_exchange,
-                routing_key=PRODUCT_CREATION_ROUTING_KEY,
-            )
-
-            # Publish message
-            producer.publish(
-                json.dumps(payload),
-                retry=True,
-                declare=[product_exchange, product_queue],
-                content_type="application/json",
-                delivery_mode=2,  # Persistent delivery
-            )
-            log.info("Product data published to RabbitMQ")
-            return True
+        publisher_pool.publish(product_exchange, PRODUCT_CREATION_ROUTING_KEY, payload)
+        log.info("Product data published to RabbitMQ")
+        return True
     except Exception as e:
         log.error(f"Failed to publish product to RabbitMQ: {str(e)}", exc_info=True)
         return False
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, Request
 
-from config.database import get_db
+from config.database import get_async_db
 from controllers import get_active_shops, get_authorized_shops, integrate_channel
 from serializers import AuthRequest
 
@@ -22,7 +22,7 @@ async def handle_get_active_shops(req: Request):
 
 
 @router.post("/integrate-channel/", tags=["auth"])
-async def handle_channel_integration(payload: AuthRequest, db=Depends(get_db)):
+async def handle_channel_integration(payload: AuthRequest, db=Depends(get_async_db)):
     return await integrate_channel(payload, db)
 
 
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Query, Request
 
 from controllers import get_order_details, get_single_order_details, fetch_orders
 
@@ -22,8 +22,19 @@ async def handle_get_single_order_details(order_id: str, req: Request):
 
 
 @router.get("/fetch", tags=["orders"])
-async def handle_fetch_orders(channel_uid: str = None, days_ago: int = 1):
-    return await fetch_orders(channel_uid, days_ago)
+async def handle_fetch_orders(
+    channel_uid: str = None,
+    days_ago: int = 1,
+    page_token: str = Query(None, description="Cursor from the previous page"),
+    page_size: int = Query(None, ge=1, le=100, description="Orders per page"),
+    stream: bool = Query(False, description="Stream orders as NDJSON per page"),
+    create_time_ge: int = Query(
+        None, description="Window start returned with the previous page"
+    ),
+):
+    return await fetch_orders(
+        channel_uid, days_ago, page_token, page_size, stream, create_time_ge
+    )
 
 
 order_router = router
@@ -1,12 +1,14 @@
-from fastapi import APIRouter, Depends, Request, Query
+from fastapi import APIRouter, Request, Query
 
-from config.database import get_db
 from controllers import (
     get_product_details,
     update_product_inventory,
     fetch_products,
     get_products_from_tiktok,
     update_inventory_all_channel,
+    get_sync_run_progress,
+    fetch_products_all_channels,
+    get_sync_batch,
 )
 from serializers import AuthRequest
 
@@ -19,14 +21,43 @@ router = APIRouter(
 
 @router.get("/fetch-all", tags=["products"])
 async def handle_fetch_products(
-    channel_uid: str = Query(..., Description="Channel UID")
+    channel_uid: str = Query(..., Description="Channel UID"),
+    force: bool = Query(False, description="Push products even if unchanged"),
 ):
-    return await fetch_products(channel_uid)
+    return await fetch_products(channel_uid, force)
+
+
+@router.get("/fetch-all/channels", tags=["products"])
+async def handle_fetch_products_all_channels(
+    force: bool = Query(False, description="Push products even if unchanged"),
+    concurrency: int = Query(None, ge=1, description="Shops synced at a time"),
+):
+    return await fetch_products_all_channels(force, concurrency)
+
+
+@router.get("/sync-batches/{batch_uid}", tags=["products"])
+async def handle_get_sync_batch(batch_uid: str):
+    return await get_sync_batch(batch_uid)
+
+
+@router.get("/sync-runs", tags=["products"])
+async def handle_get_latest_sync_run(
+    channel_uid: str = Query(..., description="Channel UID")
+):
+    return await get_sync_run_progress(channel_uid=channel_uid)
+
+
+@router.get("/sync-runs/{sync_run_id}", tags=["products"])
+async def handle_get_sync_run(sync_run_id: int):
+    return await get_sync_run_progress(sync_run_id=sync_run_id)
 
 
 @router.get("/all", tags=["products"])
-async def get_products(channel_uid: str = None):
-    return await get_products_from_tiktok(channel_uid)
+async def get_products(
+    channel_uid: str = None,
+    stream: bool = Query(False, description="Stream SKU rows as NDJSON per page"),
+):
+    return await get_products_from_tiktok(channel_uid, stream)
 
 
 @router.get("/inventory-update/multiple", tags=["products"])
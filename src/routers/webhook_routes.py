@@ -1,7 +1,15 @@
-from fastapi import APIRouter
+from http import HTTPStatus
 
-from controllers import process_webhook_request
+import orjson
+from fastapi import APIRouter, Request
+from fastapi.responses import ORJSONResponse
+from pydantic import ValidationError
+
+from config.app_vars import WEBHOOK_FAST_INGEST, WEBHOOK_VERIFY_SIGNATURE
+from controllers import process_raw_webhook_request, process_webhook_request
 from serializers import Notification
+from utils.signing import verify_webhook_signature
+from utils.spool import SpoolFullError
 
 router = APIRouter(
     prefix="/webhook",
@@ -11,8 +19,52 @@ router = APIRouter(
 
 
 @router.post("/", tags=["webhook"])
-async def handle_webhook_request(payload: Notification):
-    return await process_webhook_request(payload)
+async def handle_webhook_request(req: Request):
+    body = await req.body()
+    # Reject unsigned requests before any parsing or publishing
+    if WEBHOOK_VERIFY_SIGNATURE and not verify_webhook_signature(
+        body, req.headers.get("Authorization", "")
+    ):
+        return ORJSONResponse(
+            content={"message": "Invalid webhook signature"},
+            status_code=HTTPStatus.UNAUTHORIZED,
+        )
+    if WEBHOOK_FAST_INGEST:
+        try:
+            payload = orjson.loads(body)
+        except orjson.JSONDecodeError:
+            payload = None
+        if (
+            not isinstance(payload, dict)
+            or not isinstance(payload.get("type"), int)
+            or not payload.get("shop_id")
+            or not payload.get("tts_notification_id")
+        ):
+            return ORJSONResponse(
+                content={
+                    "message": "type, shop_id and tts_notification_id are required"
+                },
+                status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+            )
+    else:
+        try:
+            payload = Notification.model_validate_json(body)
+        except ValidationError as e:
+            return ORJSONResponse(
+                content={"detail": e.errors(include_url=False)},
+                status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+            )
+
+    try:
+        if WEBHOOK_FAST_INGEST:
+            return await process_raw_webhook_request(payload)
+        return await process_webhook_request(payload)
+    except SpoolFullError:
+        # Broker down and no room left on disk, let TikTok redeliver later
+        return ORJSONResponse(
+            content={"message": "Webhook could not be queued, retry later"},
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+        )
 
 
 webhook_router = router
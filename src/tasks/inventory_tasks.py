@@ -1,8 +1,6 @@
 import os
-import requests
 import logging as log
 import json
-import asyncio
 from collections import defaultdict
 
 from typing import List, Dict, Any
@@ -10,23 +8,26 @@ from datetime import datetime, timedelta
 
 from sqlalchemy.orm import joinedload
 from config import cel_app
-from config.app_vars import APP_KEY, APP_SECRET
 from config.database import get_db, SessionLocal
 from models import Channel, InventoryRequest
+from models.queries import PENDING_INVENTORY_REQUESTS
+from utils.async_runtime import run_async
 from utils.maps import Tiktok
+from utils.tiktok_client import tiktok_client
 
 
 # @cel_app.task(name="tasks.inventory_tasks.update_inventory_quantity_in_tiktok")
 def update_inventory_quantity_in_tiktok(channel: Channel) -> None:
     with SessionLocal() as db:
         inventory_requests: List[InventoryRequest] = (
-            db.query(InventoryRequest)
-            .filter(
-                InventoryRequest.channel_uid == channel.channel_uid,
-                InventoryRequest.status == InventoryRequest.StatusChoices.PENDING,
-                InventoryRequest.created_at >= (datetime.now() - timedelta(days=2)),
+            db.execute(
+                PENDING_INVENTORY_REQUESTS,
+                {
+                    "channel_uid": channel.channel_uid,
+                    "since": datetime.now() - timedelta(days=2),
+                },
             )
-            .order_by(InventoryRequest.created_at.asc())
+            .scalars()
             .all()
         )
         if not inventory_requests:
@@ -65,27 +66,26 @@ def update_inventory_quantity_in_tiktok(channel: Channel) -> None:
                 print(
                     f"Sending {len(skus_payload)} variations of the product {item_id}"
                 )
-                # Call TikTok API (async wrapper)
-                loop = asyncio.get_event_loop()
-                response = loop.run_until_complete(
+                # Call TikTok API on the worker event loop
+                response = run_async(
                     Tiktok.update_product_inventory(
                         item_id,
                         channel.access_token,
                         channel.shop_cipher,
                         json.dumps(payload),
                     )
-                ).json()
+                )
 
-                if response.get("code") != 0:
-                    log.error(f"Failed to update {item_id}: {response}")
+                if response.code != 0:
+                    log.error(f"Failed to update {item_id}: {response.json()}")
                     for req in requests:
                         req.status = InventoryRequest.StatusChoices.FAILED
-                        req.request_id = str(response.get("request_id", ""))
+                        req.request_id = response.request_id
                 else:
                     log.info(f"Batch update successful for product {item_id}")
                     for req in requests:
                         req.status = InventoryRequest.StatusChoices.SUCCESS
-                        req.request_id = str(response.get("request_id", ""))
+                        req.request_id = response.request_id
 
                 db.commit()
 
@@ -98,42 +98,53 @@ def update_inventory_quantity_in_tiktok(channel: Channel) -> None:
 
 @cel_app.task(name="tasks.inventory_tasks.update_inventory_stock_all_channel")
 def update_inventory_stock_all_channel():
+    """Fan the inventory push out to one task per channel, on its shop's shard."""
+    with SessionLocal() as db:
+        channels = db.query(Channel.channel_uid, Channel.shop_id).all()
+    for channel_uid, shop_id in channels:
+        update_inventory_stock.delay(channel_uid=channel_uid, shop_id=shop_id)
+    log.info(f"Inventory stock update queued for {len(channels)} channels")
+
+
+@cel_app.task(name="tasks.inventory_tasks.update_inventory_stock")
+def update_inventory_stock(channel_uid: str, shop_id: int = None):
+    # shop_id is only read by the router, to keep the shop on a single shard
     with SessionLocal() as db:
         try:
-            channels: List[Channel] = db.query(Channel).all()
-            for channel in channels:
-                # Check if the tokens are expired or not. If expired then get the new token
-                current_timestamp = int(datetime.now().timestamp())
-                if current_timestamp > channel.access_token_expiry:
-                    # Need to get the new token and store it in the database
-                    url: str = "https://auth.tiktok-shops.com/api/v2/token/refresh"
-                    headers = {"Content-Type": "application/json"}
-                    params: Dict[str, Any] = {
-                        "app_key": APP_KEY,
-                        "app_secret": APP_SECRET,
+            channel: Channel = (
+                db.query(Channel).filter(Channel.channel_uid == channel_uid).first()
+            )
+            if not channel:
+                log.info(f"Channel not found for: {channel_uid}")
+                return None
+            # Check if the tokens are expired or not. If expired then get the new token
+            current_timestamp = int(datetime.now().timestamp())
+            if current_timestamp > channel.access_token_expiry:
+                # Need to get the new token and store it in the database
+                response = tiktok_client.request(
+                    "refresh_access_token",
+                    params={
                         "refresh_token": channel.refresh_token,
                         "grant_type": "refresh_token",
-                    }
-                    response = requests.get(url, params=params, headers=headers).json()
-                    if response.get("code") != 0:
-                        log.error("Failed to get new refresh token")
-                        return None
+                    },
+                )
+                if response.code != 0:
+                    log.error("Failed to get new refresh token")
+                    return None
 
-                    data = response.get("data", {})
-                    channel.access_token = data.get("access_token", "")
-                    channel.refresh_token = data.get("refresh_token", "")
-                    channel.access_token_expiry = int(
-                        data.get("access_token_expire_in", 0)
-                    )
-                    channel.refresh_token_expiry = int(
-                        data.get("refresh_token_expire_in", 0)
-                    )
-                    db.commit()
+                data = response.data
+                channel.access_token = data.get("access_token", "")
+                channel.refresh_token = data.get("refresh_token", "")
+                channel.access_token_expiry = int(data.get("access_token_expire_in", 0))
+                channel.refresh_token_expiry = int(
+                    data.get("refresh_token_expire_in", 0)
+                )
+                db.commit()
 
-                # Send request to TikTok for each channel
-                update_inventory_quantity_in_tiktok(channel)
+            # Send request to TikTok for the channel
+            update_inventory_quantity_in_tiktok(channel)
         except Exception as e:
-            log.error(f"Error updating inventory stock for all channels: {str(e)}")
+            log.error(f"Error updating inventory stock for {channel_uid}: {str(e)}")
             db.rollback()
         finally:
-            log.info("Inventory stock update task completed.")
+            log.info(f"Inventory stock update of {channel_uid} completed.")
@@ -1,19 +1,20 @@
-import asyncio
 import logging as log
 from typing import Any, Dict, List
 from collections import defaultdict
 from sqlalchemy.orm import joinedload
 
+from config.app_vars import CORE_SERVICE_PUBLISH, ORDER_WEBHOOK_COALESCE_SECONDS
 from config.database import get_db
 from config.worker import cel_app
 from models import Channel
 from publishers import publish_order_in_queue
 from serializers import OrderData, preprocess_order_data
-from utils.helpers import notify_new_order_v2
+from utils.coalescing import is_latest_order_update
+from utils.helpers import get_channel_by_shop_id, notify_new_order_v2
+from utils.async_runtime import run_async
 from utils.maps import Tiktok
 from utils.shipping import TiktokShipping
 
-
 order_status_map = {
     "UNPAID": "PENDING",
     "AWAITING_SHIPMENT": "OPEN_ORDER",
@@ -123,11 +124,16 @@ def prepare_order_payload(
 )
 def process_order(shop_id: int, data: Dict[Any, Any]):
     order_data = OrderData(**data)
+    if ORDER_WEBHOOK_COALESCE_SECONDS > 0 and not is_latest_order_update(
+        order_data.order_id, order_data.update_time
+    ):
+        log.info(
+            f"Newer webhook of order {order_data.order_id} is queued, skipping this one"
+        )
+        return
     db = next(get_db())
     try:
-        channel: Channel = (
-            db.query(Channel).filter(Channel.shop_id == int(shop_id)).first()
-        )
+        channel: Channel = get_channel_by_shop_id(db, shop_id)
         if channel is None:
             log.error({"error": f"channel for shop_id {shop_id} not found"})
             return
@@ -136,8 +142,7 @@ def process_order(shop_id: int, data: Dict[Any, Any]):
 
     # get order details
 
-    loop = asyncio.get_event_loop()
-    order_response = loop.run_until_complete(
+    order_response = run_async(
         Tiktok.get_single_order_details(
             order_data.order_id,
             access_token=channel.access_token,
@@ -145,12 +150,12 @@ def process_order(shop_id: int, data: Dict[Any, Any]):
         )
     )
 
-    if order_response.json().get("code") != 0:
+    if order_response.code != 0:
         log.info(f"failed to fetch order id {order_data.order_id}")
         return
 
     # preprocess order payload
-    tiktok_order = order_response.json().get("data", {}).get("orders", [])
+    tiktok_order = order_response.data.get("orders", [])
 
     if not tiktok_order:
         log.info("Order array is empty")
@@ -160,39 +165,37 @@ def process_order(shop_id: int, data: Dict[Any, Any]):
     shipping_providers = []
     if delivery_option_id:
         # log.info(f"Delivery option id: {delivery_option_id}")
-        shipping_provider_response = loop.run_until_complete(
+        shipping_provider_response = run_async(
             TiktokShipping.get_shipping_providers(
                 delivery_option_id=delivery_option_id,
                 channel=channel,
             )
         )
-        # log.info("Shipping provider response:", shipping_provider_response.json())
-        if shipping_provider_response.json().get("code") != 0:
+        if shipping_provider_response.code != 0:
             log.error(
                 f"Failed to fetch shipping providers for delivery option id {delivery_option_id}"
             )
         else:
-            shipping_providers = (
-                shipping_provider_response.json()
-                .get("data", {})
-                .get("shipping_providers", [])
+            shipping_providers = shipping_provider_response.data.get(
+                "shipping_providers", []
             )
-    # TODO: This portion sends the order in mye core service (Commenting now, uncomment when core service is ready)
-    # order_payload = prepare_order_payload(
-    #     tiktok_order=tiktok_order[0],
-    #     store_id=channel.channel_uid,
-    #     payment_status=order_data.order_status,
-    #     shipping_providers=shipping_providers,
-    # )
-    # orders_to_publish = {"Orders": [order_payload]}
-    # # push the order data in order queue
-    # publish_order_in_queue(orders_to_publish)
+    if CORE_SERVICE_PUBLISH:
+        order_payload = prepare_order_payload(
+            tiktok_order=tiktok_order[0],
+            store_id=channel.channel_uid,
+            payment_status=order_data.order_status,
+            shipping_providers=shipping_providers,
+        )
+        # A webhook carries a single order, published on its own
+        if not publish_order_in_queue(order_payload):
+            raise RuntimeError(f"Failed to publish order {order_data.order_id}")
+        return
     # Add order in MYE Order Service
     # TODO: This part is for sending order in order service
     # preprocess order payload
     order_payload_mos = preprocess_order_data(
         channel_uid=channel.channel_uid,
-        order_data=order_response.json().get("data"),
+        order_data=order_response.data,
         shipping_providers=shipping_providers,
     )
 
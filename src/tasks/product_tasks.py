@@ -1,18 +1,45 @@
-import time
-
-import asyncio
 import logging as log
 from typing import Any, Dict, List
 import requests
 
 from config.worker import cel_app
-from config.app_vars import MYE_INVENTORY_AND_MAPPING_SERVICE_URL, MIAMS_SECRET_KEY
+from config.app_vars import (
+    CORE_SERVICE_PUBLISH,
+    MYE_INVENTORY_AND_MAPPING_SERVICE_URL,
+    MIAMS_SECRET_KEY,
+    PRODUCT_SYNC_CONCURRENCY,
+)
 from serializers import ProductData, RemoteProductData
-from models import Channel
+from models import Channel, SyncRun
+from utils.async_runtime import run_async
 from utils.maps import Tiktok
 from utils.helpers import get_channel_token_by_shop_id, get_channel_and_token
+from utils.fingerprints import (
+    compute_product_fingerprint,
+    fingerprint_stats,
+    get_product_fingerprint,
+    save_product_fingerprint,
+)
+from utils.sync_runs import (
+    checkpoint_sync_run,
+    claim_next_sync_run,
+    claim_sync_run,
+    create_sync_batch,
+    finish_sync_run,
+    get_channel_shop_id,
+    get_sync_run,
+    is_page_token_error,
+    start_or_resume_sync_run,
+)
 
-from publishers import publish_product_in_queue
+from publishers import product_buffer
+
+
+class ProductPushStatus:
+    SENT = "SENT"
+    UNCHANGED = "UNCHANGED"
+    EMPTY = "EMPTY"
+    FAILED = "FAILED"
 
 
 def prepare_product_data(
@@ -41,7 +68,9 @@ def prepare_product_data(
     return payload
 
 
-def send_product_to_miams(channel_uid: str, company_uid: str, product: Dict[str, Any]):
+def send_product_to_miams(
+    channel_uid: str, company_uid: str, product: Dict[str, Any], force: bool = False
+) -> str:
     # TODO This is a temporary solution, we need to remove this later when our core service is ready
     # We need to send the product data to the queue
     payload = {
@@ -49,6 +78,7 @@ def send_product_to_miams(channel_uid: str, company_uid: str, product: Dict[str,
         "company_uid": company_uid,
     }
     product_data = []
+    prices = []
     for sku in product.get("skus", []):
         seller_sku = sku.get("seller_sku", "")
         if not seller_sku:
@@ -74,9 +104,20 @@ def send_product_to_miams(channel_uid: str, company_uid: str, product: Dict[str,
                 },
             }
         )
+        prices.append(sku.get("price", {}).get("sale_price", 0))
     if not product_data or product_data == []:
         print("No Product to send in MIAMS")
-        return True
+        return ProductPushStatus.EMPTY
+
+    # Skip the push when nothing MIAMS cares about changed since the last one
+    product_id = str(product.get("id", ""))
+    content_hash = compute_product_fingerprint(product_data, prices)
+    fingerprint_stats.record("checked")
+    if not force and get_product_fingerprint(channel_uid, product_id) == content_hash:
+        fingerprint_stats.record("skipped")
+        log.info(f"Product {product_id} is unchanged, skipping MIAMS push")
+        return ProductPushStatus.UNCHANGED
+
     payload["data"] = product_data
     print(f"Sending {len(product_data)} to MIAMS")
     # Send the request to the remote product add endpoint
@@ -93,42 +134,74 @@ def send_product_to_miams(channel_uid: str, company_uid: str, product: Dict[str,
     if int(response.status_code) != 201:
         log.info(f"Failed to add remote product. Error code {response.status_code}")
         print("response: ", response.json())
-        return False
+        return ProductPushStatus.FAILED
 
+    save_product_fingerprint(channel_uid, product_id, content_hash)
+    fingerprint_stats.record("sent")
     log.info(f"Products send to miams successfully {response.json()}")
-    return True
+    return ProductPushStatus.SENT
+
+
+def send_product_to_core(
+    channel_uid: str, company_uid: str, product: Dict[str, Any], force: bool = False
+) -> str:
+    """
+    Add the SKUs of a product to the core service batch, published as
+    {"Products": [...]} before the task returns.
+    """
+    products = [
+        prepare_product_data(
+            store_id=channel_uid,
+            company_uid=company_uid,
+            product=product,
+            sku_info=sku,
+        )
+        for sku in product.get("skus", [])
+    ]
+    if not products:
+        return ProductPushStatus.EMPTY
+
+    # Same change detection as the MIAMS push, over the core service rows
+    product_id = str(product.get("id", ""))
+    content_hash = compute_product_fingerprint(
+        products, [row["price"] for row in products]
+    )
+    fingerprint_stats.record("checked")
+    if not force and get_product_fingerprint(channel_uid, product_id) == content_hash:
+        fingerprint_stats.record("skipped")
+        log.info(f"Product {product_id} is unchanged, skipping core service push")
+        return ProductPushStatus.UNCHANGED
+
+    with product_buffer.batch():
+        product_buffer.extend(products)
+        # Only remembered once the broker confirmed the batch
+        product_buffer.on_published(
+            lambda: save_product_fingerprint(channel_uid, product_id, content_hash)
+        )
+        product_buffer.on_published(lambda: fingerprint_stats.record("sent"))
+    return ProductPushStatus.SENT
 
 
 def send_product_request(
-    product_data: Dict[str, Any], channel: Channel, task_type: str
-) -> None:
-    # TODO: this portion is to send product in queue(Core service Compatible)
-    # products = []
-    # for sku in product_data.get("skus", []):
-    #     product_payload = prepare_product_data(
-    #         store_id=channel.channel_uid,
-    #         company_uid=channel.company_uuid,
-    #         product=product_data,
-    #         sku_info=sku,
-    #     )
-    #     products.append(product_payload)
-    # payload = {"Products": products}
-    # # Add the product data to the queue
-    # result = publish_product_in_queue(payload)
-    # if result:
-    #     log.info(f"Product {task_type} request added in queue successfully")
-    # else:
-    #     log.info(f"Product {task_type} request failed to add in queue")
+    product_data: Dict[str, Any], channel: Channel, task_type: str, force: bool = False
+) -> str:
+    if CORE_SERVICE_PUBLISH:
+        result = send_product_to_core(
+            channel.channel_uid, channel.company_uuid, product_data, force=force
+        )
+        if result == ProductPushStatus.SENT:
+            log.info(f"Product {task_type} request added to the core service batch")
+        return result
 
     # Send the request to the miams service
-    # TODO: When the core service is ready then uncommect above code and comment this line.
     result = send_product_to_miams(
-        channel.channel_uid, channel.company_uuid, product_data
+        channel.channel_uid, channel.company_uuid, product_data, force=force
     )
-    if result:
-        log.info(f"Product {task_type} request added in MIAMS successfully")
-    else:
+    if result == ProductPushStatus.FAILED:
         log.info(f"Product {task_type} request failed to add in MIAMS")
+    elif result == ProductPushStatus.SENT:
+        log.info(f"Product {task_type} request added in MIAMS successfully")
+    return result
 
 
 @cel_app.task(
@@ -143,9 +216,7 @@ def process_product_creation(shop_id: str, data: Dict[Any, Any]):
     if not channel:
         log.error(f"Failed to get channel for shop id: {shop_id}")
         return None
-    # Run the async function synchronously
-    loop = asyncio.get_event_loop()
-    product = loop.run_until_complete(
+    product = run_async(
         Tiktok.get_single_product_details(
             product_id=product_data.product_id,
             access_token=channel.access_token,
@@ -153,13 +224,11 @@ def process_product_creation(shop_id: str, data: Dict[Any, Any]):
         )
     )
 
-    product_json = product.json()
-
-    if product_json.get("code") != 0:
+    if product.code != 0:
         log.info(f"failed to fetch product id {product_data.product_id}")
         return
     # Send the create request to add in queue
-    send_product_request(product_json["data"], channel, "create")
+    send_product_request(product.data, channel, "create")
 
 
 @cel_app.task(
@@ -190,63 +259,191 @@ def process_product_update(shop_id: str, data: Dict[Any, Any]):
         log.error(f"Failed to get channel for shop id: {shop_id}")
         return None
 
-    # Run the async function synchronously
-    loop = asyncio.get_event_loop()
-    product = loop.run_until_complete(
+    product = run_async(
         Tiktok.get_single_product_details(
             product_id=product_id,
             access_token=channel.access_token,
             shop_cipher=channel.shop_cipher,
         )
     )
-    product_json = product.json()
-    if product_json.get("code") != 0:
+    if product.code != 0:
         log.info(f"failed to fetch product id {product_id}")
         return
     # send the product update request to queue
-    send_product_request(product_json["data"], channel, "update")
+    send_product_request(product.data, channel, "update")
 
 
 @cel_app.task(
     name="tasks.product.fetch_all_products",
-    retry_kwargs={"max_retries": 3, "countdown": 5},
-    ack_late=True,
+    bind=True,
+    max_retries=3,
+    acks_late=True,
+    reject_on_worker_lost=True,
 )
-def process_all_products(channel_uid: str):
-    next_page_token = ""
-    total_products = 0
-    loop = asyncio.get_event_loop()
-    channel = loop.run_until_complete(get_channel_and_token(channel_uid=channel_uid))
-
-    if not channel:
-        log.info(f"Channel not found for: {channel_uid}")
+def process_all_products(
+    self,
+    channel_uid: str,
+    force: bool = False,
+    sync_run_id: int = None,
+    shop_id: int = None,
+):
+    # shop_id is only read by the router, to keep the shop on a single shard
+    # Continue from the last checkpoint when the run was interrupted
+    if not sync_run_id:
+        sync_run = start_or_resume_sync_run(channel_uid, force)
+        sync_run_id = sync_run.id if sync_run else None
+    # A redelivered message takes over the run its dead worker left RUNNING
+    redelivered = bool((self.request.delivery_info or {}).get("redelivered"))
+    sync_run = (
+        claim_sync_run(sync_run_id, self.request.id, take_over=redelivered)
+        if sync_run_id
+        else None
+    )
+    if not sync_run:
+        # The batch slot belongs to the run, not to this message: the task that
+        # drives or finished the run dispatches the next one from its finally
+        # below. A run left by a dead worker is taken over instead of skipped.
+        current = get_sync_run(sync_run_id) if sync_run_id else None
+        log.info(
+            f"Sync run {sync_run_id} of channel {channel_uid} is not claimable: "
+            f"{current.status if current else 'not found'}, "
+            f"held by task {current.task_id if current else None}"
+        )
         return
 
-    while True:
-        loop = asyncio.get_event_loop()
-        response = loop.run_until_complete(
-            Tiktok.get_products(
-                channel.access_token,
-                channel.shop_cipher,
-                page_token=next_page_token,
+    # Every exit but a scheduled retry closes the run and frees its batch slot
+    completed, retrying = False, False
+    error = "Sync stopped before the last page"
+    try:
+        channel = run_async(get_channel_and_token(channel_uid=channel_uid))
+        if not channel:
+            log.info(f"Channel not found for: {channel_uid}")
+            error = "Channel not found or its token could not be refreshed"
+            return
+
+        next_page_token = sync_run.next_page_token or ""
+        pages = sync_run.pages
+        total_products = sync_run.total_products
+        skipped_products = sync_run.skipped_products
+
+        # Pages are paced by the "product" rate limit of the TikTok client
+        while True:
+            response = run_async(
+                Tiktok.get_products(
+                    channel.access_token,
+                    channel.shop_cipher,
+                    page_token=next_page_token,
+                )
             )
-        )
-        response = response.json()
-        if response.get("code") != 0:
-            log.error(f"Failed to fetch products: {response}")
-            break
-        products = response.get("data", {}).get("products", [])
+            if response.code != 0:
+                log.error(f"Failed to fetch products: {response.json()}")
+                error = str(response.message)
+                # An expired page token starts a new run on the next sync instead
+                if self.request.retries < self.max_retries and not is_page_token_error(
+                    response.message
+                ):
+                    finish_sync_run(
+                        sync_run.id, SyncRun.StatusChoices.FAILED, error=error[:512]
+                    )
+                    retrying = True
+                    raise self.retry(
+                        countdown=5,
+                        kwargs={
+                            "channel_uid": channel_uid,
+                            "force": force,
+                            "sync_run_id": sync_run.id,
+                            "shop_id": shop_id,
+                        },
+                    )
+                return
+            products = response.data.get("products", [])
 
-        next_page_token = response.get("data", {}).get("next_page_token", "")
-        has_more = bool(next_page_token)
-        for product in products:
-            total_products += 1
-            send_product_request(product, channel, "create")
+            next_page_token = response.data.get("next_page_token", "")
+            has_more = bool(next_page_token)
+            # The products of a page are published together, before the checkpoint
+            with product_buffer.batch():
+                for product in products:
+                    total_products += 1
+                    result = send_product_request(
+                        product, channel, "create", force=force
+                    )
+                    if result == ProductPushStatus.UNCHANGED:
+                        skipped_products += 1
 
-        if not has_more:
-            break
+            pages += 1
+            checkpoint_sync_run(
+                sync_run.id, next_page_token, pages, total_products, skipped_products
+            )
+
+            if not has_more:
+                break
+
+        finish_sync_run(sync_run.id, SyncRun.StatusChoices.COMPLETED)
+        completed = True
+    except Exception as e:
+        if not retrying:
+            log.exception(f"Sync run {sync_run.id} of channel {channel_uid} failed")
+            error = str(e)
+        raise
+    finally:
+        if not retrying:
+            try:
+                if not completed:
+                    finish_sync_run(
+                        sync_run.id, SyncRun.StatusChoices.FAILED, error=error[:512]
+                    )
+            finally:
+                dispatch_next_sync_run(sync_run.batch_uid, force)
+
+    log.info(
+        f"Total products processed: {total_products}, unchanged and skipped: {skipped_products}"
+    )
+    log.info(
+        f"Product fingerprint stats for this worker: {fingerprint_stats.snapshot()}"
+    )
 
-        # Avoid rate-limiting
-        # time.sleep(1)
 
-    log.info(f"Total products processed: {total_products}")
+def dispatch_next_sync_run(batch_uid: str, force: bool = False) -> bool:
+    """Start the next waiting channel of a multi channel sync batch."""
+    if not batch_uid:
+        return False
+    sync_run = claim_next_sync_run(batch_uid)
+    if not sync_run:
+        log.info(f"No more channels waiting in sync batch {batch_uid}")
+        return False
+    queue_sync_run(sync_run.channel_uid, sync_run.id, force)
+    return True
+
+
+def queue_sync_run(channel_uid: str, sync_run_id: int, force: bool = False):
+    """Publish a channel sync to the shard of its shop, next to its webhooks."""
+    process_all_products.delay(
+        channel_uid=channel_uid,
+        force=force,
+        sync_run_id=sync_run_id,
+        shop_id=get_channel_shop_id(channel_uid),
+    )
+
+
+@cel_app.task(name="tasks.product.fetch_all_channels")
+def process_all_channels_products(
+    force: bool = False, concurrency: int = None, batch_uid: str = None
+):
+    """
+    Sync the catalogue of every channel, at most `concurrency` shops at a time.
+
+    Each finished shop starts the next waiting one, so the batch keeps the same
+    number of syncs in flight until every channel is done.
+    """
+    batch_uid = batch_uid or create_sync_batch()
+    if not batch_uid:
+        log.info("No channels to sync")
+        return None
+
+    started = 0
+    for _ in range(concurrency or PRODUCT_SYNC_CONCURRENCY):
+        if not dispatch_next_sync_run(batch_uid, force):
+            break
+        started += 1
+    log.info(f"Sync batch {batch_uid} started with {started} channels running")
+    return batch_uid
@@ -1,26 +1,165 @@
-from typing import Any, Dict
+import datetime
+import logging as log
+from typing import Any, Dict, List, Union
 
-from config.worker import cel_app
+from pydantic import ValidationError
+
+from config.app_vars import (
+    ORDER_WEBHOOK_COALESCE_SECONDS,
+    WEBHOOK_SPOOL_DIR,
+    WEBHOOK_SPOOL_MAX_BYTES,
+    WEBHOOK_SPOOL_SEGMENT_BYTES,
+)
+from config.worker import cel_app, shard_queue
+from serializers import Notification
 from tasks import process_order, process_product_creation, process_product_update
 from tasks.authorization_tasks import upcoming_authorization_expiration
 from tasks.message_tasks import handle_new_message
+from utils.coalescing import purge_order_webhook_states, record_order_update
+from utils.idempotency import purge_expired_notifications
+from utils.spool import Spool
+
+# Webhook type -> task that handles it and the queue it is published to
+WEBHOOK_ROUTES: Dict[int, Dict[str, Any]] = {
+    1: {
+        "task": process_order,
+        "queue": "tiktok_high_priority_queue",
+        "coalesce": True,
+    },
+    7: {"task": upcoming_authorization_expiration, "queue": "tiktok-queue"},
+    14: {"task": handle_new_message, "queue": "tiktok-queue"},
+    15: {"task": process_product_update, "queue": "tiktok-queue"},
+    16: {"task": process_product_creation, "queue": "tiktok-queue"},
+    # 27: "inventory_status_change"
+}
+
+
+webhook_spool = Spool(
+    WEBHOOK_SPOOL_DIR, WEBHOOK_SPOOL_MAX_BYTES, WEBHOOK_SPOOL_SEGMENT_BYTES
+)
+
+
+def publish_or_spool(task, args: tuple, options: Dict[str, Any]):
+    """
+    Publish a task without retrying, or append it to the disk spool.
+
+    While spooled webhooks are waiting the broker is assumed to be down and new
+    ones go straight to the spool, which also keeps their order. Raises
+    SpoolFullError when the spool has no room left.
+    """
+    if not webhook_spool.has_pending():
+        try:
+            task.apply_async(args=args, retry=False, **options)
+            return
+        except Exception as e:
+            log.error(f"Failed to publish {task.name}, spooling it: {e}")
+    webhook_spool.append({"task": task.name, "args": list(args), "options": options})
+
+
+def replay_spooled_webhooks(records: List[Dict[str, Any]]):
+    """Publish a batch of spooled webhooks over a single broker connection."""
+    with cel_app.producer_or_acquire() as producer:
+        for record in records:
+            cel_app.send_task(
+                record["task"],
+                args=record["args"],
+                producer=producer,
+                retry=False,
+                **record["options"],
+            )
+
+
+def _publish_options(route: Dict[str, Any], shop_id: str, data: Dict[Any, Any]):
+    options = {"queue": shard_queue(route["queue"], shop_id)}
+    # Hold order webhooks for a moment so a burst of status changes is fetched once
+    if route.get("coalesce") and ORDER_WEBHOOK_COALESCE_SECONDS > 0:
+        if record_order_update(data.get("order_id"), shop_id, data.get("update_time")):
+            options["countdown"] = ORDER_WEBHOOK_COALESCE_SECONDS
+    return options
+
+
+def dispatch_webhook(payload: Dict[Any, Any], spool: bool = True) -> bool:
+    """
+    Publish the webhook straight to the task of its type.
+
+    Only the API process drains the spool, in a worker pass spool=False to
+    publish directly and let a failure raise for the task to be retried.
+    """
+    route = WEBHOOK_ROUTES.get(payload.get("type"))
+    if not route:
+        log.info(f"No task for webhook type {payload.get('type')}, ignoring")
+        return False
+    data = payload.get("data") or {}
+    options = _publish_options(route, payload.get("shop_id"), data)
+    args = (payload.get("shop_id"), data)
+    if spool:
+        publish_or_spool(route["task"], args, options)
+    else:
+        route["task"].apply_async(args=args, **options)
+    return True
+
+
+def dispatch_raw_webhook(payload: Dict[Any, Any]) -> bool:
+    """
+    Publish the webhook to the queue of its type without validating it.
+
+    `payload` is the plain orjson decoded body. It travels as a JSON object in
+    the Celery message, the worker validates it.
+    """
+    route = WEBHOOK_ROUTES.get(payload.get("type"))
+    if not route:
+        log.info(f"No task for webhook type {payload.get('type')}, ignoring")
+        return False
+    data = payload.get("data")
+    options = _publish_options(
+        route, payload.get("shop_id"), data if isinstance(data, dict) else {}
+    )
+    publish_or_spool(process_raw_webhook, (payload,), options)
+    return True
 
 
+@cel_app.task(
+    name="tasks.webhook.process_raw",
+    autoretry_for=(Exception,),
+    retry_kwargs={"max_retries": 3, "countdown": 5},
+    ack_late=True,
+)
+def process_raw_webhook(body: Union[Dict[Any, Any], str]):
+    """Validate a webhook forwarded by the fast ingest path and run its task here."""
+    try:
+        # Messages queued before the payload was forwarded as an object hold a str
+        if isinstance(body, str):
+            notification = Notification.model_validate_json(body)
+        else:
+            notification = Notification.model_validate(body)
+    except ValidationError as e:
+        log.error(f"Invalid webhook payload dropped: {e}")
+        return
+    route = WEBHOOK_ROUTES.get(notification.type)
+    if not route:
+        log.info(f"No task for webhook type {notification.type}, ignoring")
+        return
+    payload = notification.model_dump()
+    route["task"](payload.get("shop_id"), payload.get("data"))
+
+
+# Kept for webhooks queued before the API published to the typed tasks directly
 @cel_app.task(
     name="tasks.webhook.process",
     queue="tiktok_high_priority_queue",
+    autoretry_for=(Exception,),
     retry_kwargs={"max_retries": 3, "countdown": 5},
     ack_late=True,
 )
 def process_webhook_data(payload: Dict[Any, Any]):
-    webhook_type = {
-        1: process_order,
-        7: upcoming_authorization_expiration,
-        14: handle_new_message,
-        15: process_product_update,
-        16: process_product_creation,
-        # 27: "inventory_status_change"
-    }
-    func = webhook_type.get(payload.get("type"))
-    func.delay(payload.get("shop_id"), payload.get("data"))
+    # No spool in the worker, nothing would ever replay it here
+    dispatch_webhook(payload, spool=False)
     return
+
+
+@cel_app.task(name="tasks.webhook.purge_notifications")
+def purge_webhook_notifications():
+    deleted = purge_expired_notifications()
+    log.info(f"Purged {deleted} expired webhook notification ids")
+    deleted = purge_order_webhook_states(datetime.timedelta(days=1))
+    log.info(f"Purged {deleted} order webhook states")
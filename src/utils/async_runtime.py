@@ -0,0 +1,62 @@
+import asyncio
+import logging as log
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Coroutine, Optional
+
+_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_thread: Optional[threading.Thread] = None
+_pid: Optional[int] = None
+
+
+def _run_loop(loop: asyncio.AbstractEventLoop):
+    asyncio.set_event_loop(loop)
+    loop.run_forever()
+
+
+def start_async_runtime(threads: Optional[int] = None) -> asyncio.AbstractEventLoop:
+    """
+    Start the event loop of this process in a background thread.
+
+    The loop lives as long as the process, so async clients and caches bound to
+    it are shared by every task. A forked child gets a loop of its own.
+    `threads` sizes the executor of `asyncio.to_thread`, which otherwise runs at
+    most min(32, cpu + 4) blocking calls at once.
+    """
+    global _loop, _thread, _pid
+    with _lock:
+        if _loop is not None and _pid == os.getpid() and _loop.is_running():
+            return _loop
+        _loop = asyncio.new_event_loop()
+        if threads:
+            _loop.set_default_executor(
+                ThreadPoolExecutor(max_workers=threads, thread_name_prefix="to-thread")
+            )
+        _thread = threading.Thread(
+            target=_run_loop, args=(_loop,), name="async-runtime", daemon=True
+        )
+        _thread.start()
+        _pid = os.getpid()
+        log.info(f"Async runtime started in process {_pid}")
+        return _loop
+
+
+def stop_async_runtime(timeout: float = 5):
+    global _loop, _thread, _pid
+    with _lock:
+        if _loop is None or _pid != os.getpid():
+            return
+        _loop.call_soon_threadsafe(_loop.stop)
+        _thread.join(timeout)
+        _loop.close()
+        _loop, _thread, _pid = None, None, None
+
+
+def run_async(coro: Coroutine, timeout: Optional[float] = None) -> Any:
+    """Run `coro` on the process event loop and wait for its result."""
+    loop = _loop if _pid == os.getpid() else None
+    if loop is None or not loop.is_running():
+        loop = start_async_runtime()
+    return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
@@ -0,0 +1,61 @@
+import datetime
+import logging as log
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+
+from config.database import SessionLocal
+from models import OrderWebhookState
+
+
+def record_order_update(order_id: str, shop_id: str, update_time: int) -> bool:
+    """Remember the newest update_time seen for an order webhook."""
+    with SessionLocal() as db:
+        try:
+            statement = insert(OrderWebhookState).values(
+                order_id=order_id, shop_id=shop_id, update_time=update_time
+            )
+            db.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[OrderWebhookState.order_id],
+                    set_={
+                        "update_time": func.greatest(
+                            OrderWebhookState.update_time,
+                            statement.excluded.update_time,
+                        ),
+                        "updated_at": func.now(),
+                    },
+                )
+            )
+            db.commit()
+            return True
+        except Exception as e:
+            db.rollback()
+            log.error(f"Error recording update of order {order_id}: {e}")
+            return False
+
+
+def is_latest_order_update(order_id: str, update_time: int) -> bool:
+    """False when a newer webhook of the same order is waiting to be processed."""
+    with SessionLocal() as db:
+        try:
+            latest = (
+                db.query(OrderWebhookState.update_time)
+                .filter(OrderWebhookState.order_id == order_id)
+                .scalar()
+            )
+        except Exception as e:
+            log.error(f"Error reading update of order {order_id}: {e}")
+            return True
+    return latest is None or update_time >= latest
+
+
+def purge_order_webhook_states(max_age: datetime.timedelta) -> int:
+    with SessionLocal() as db:
+        deleted = (
+            db.query(OrderWebhookState)
+            .filter(OrderWebhookState.updated_at < func.now() - max_age)
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+    return deleted
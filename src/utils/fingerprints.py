@@ -0,0 +1,86 @@
+import hashlib
+import logging as log
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import orjson
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.sql import func
+
+from config.database import SessionLocal
+from models import ProductFingerprint
+
+
+class FingerprintStats:
+    """Process wide counters of the change detection, logged by the product tasks."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Counter = Counter()
+
+    def record(self, key: str, count: int = 1):
+        with self._lock:
+            self._counts[key] += count
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+
+fingerprint_stats = FingerprintStats()
+
+
+def compute_product_fingerprint(
+    product_data: List[Dict[str, Any]], prices: List[Any]
+) -> str:
+    """
+    Hash the MIAMS payload rows of a product together with the SKU prices.
+
+    :param product_data: Rows sent for the product, one per SKU, each with
+        "sku" and product_metadata["sku_id"].
+    :param prices: SKU prices in the same order as product_data.
+    :return: Hex digest that only changes when a field of the rows changes.
+    """
+    rows = [dict(row, price=price) for row, price in zip(product_data, prices)]
+    rows.sort(key=lambda row: (row["sku"], str(row["product_metadata"]["sku_id"])))
+    return hashlib.sha256(orjson.dumps(rows, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+def get_product_fingerprint(channel_uid: str, product_id: str) -> Optional[str]:
+    with SessionLocal() as db:
+        try:
+            return (
+                db.query(ProductFingerprint.content_hash)
+                .filter(
+                    ProductFingerprint.channel_uid == channel_uid,
+                    ProductFingerprint.product_id == product_id,
+                )
+                .scalar()
+            )
+        except Exception as e:
+            log.error(f"Error fetching fingerprint of product {product_id}: {e}")
+            return None
+
+
+def save_product_fingerprint(channel_uid: str, product_id: str, content_hash: str):
+    with SessionLocal() as db:
+        try:
+            statement = insert(ProductFingerprint).values(
+                channel_uid=channel_uid,
+                product_id=product_id,
+                content_hash=content_hash,
+            )
+            db.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[
+                        ProductFingerprint.channel_uid,
+                        ProductFingerprint.product_id,
+                    ],
+                    set_={"content_hash": content_hash, "updated_at": func.now()},
+                )
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            log.error(f"Error saving fingerprint of product {product_id}: {e}")
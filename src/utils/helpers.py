@@ -1,87 +1,19 @@
-import hashlib
-import hmac
 import json
 import logging as log
-from urllib.parse import parse_qs, urlencode, urlparse
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import Session, joinedload
 import requests
 import datetime
-from typing import Dict, Any
-import asyncio
+from typing import Optional
 
 from config.app_vars import (
     INTEGRATION_SERVICE,
     MYE_ORDER_SERVICE_URL,
-    APP_KEY,
-    APP_SECRET,
     MOS_SECRET_KEY,
 )
-from config.database import get_db, SessionLocal
+from config.database import get_db, AsyncSessionLocal, SessionLocal
 from models import Channel
-
-
-async def calculate_signature(
-    url: str, params: dict, headers: dict, secret: str, body: bytes = None, **kwargs
-):
-    """
-    Calculate the signature based on query parameters, request path, and body.
-
-    :param req: A dictionary representing the request with keys 'url', 'headers', and 'body'.
-                - 'url' should contain the full URL of the request.
-                - 'headers' should be a dictionary of HTTP headers.
-                - 'body' should be a byte stream or a string of the request body.
-    :param secret: The app secret key used for signing.
-    :return: The calculated signature as a hexadecimal string.
-    """
-    # Parse query parameters from the URL
-    url_parts = urlparse(url)
-    query_string = urlencode(params, doseq=True)
-    queries = parse_qs(query_string)
-
-    for k, v in kwargs.items():
-        queries[k] = [str(v)]
-
-    # Extract all query parameters excluding 'sign' and 'access_token'
-    keys = [k for k in queries if k not in {"sign", "access_token"}]
-
-    # Reorder the parameters' keys in alphabetical order
-    keys.sort()
-
-    # Concatenate all the parameters in the format of {key}{value}
-    input_data = ""
-    for key in keys:
-        input_data += key + "".join(
-            queries[key]
-        )  # Join query values as a single string
-
-    # Append the request path
-    input_data = url_parts.path + input_data
-
-    # Check if Content-Type is not multipart/form-data and append body if needed
-    content_type = headers.get("Content-Type", "")
-    if not content_type.startswith("multipart/form-data"):
-        if isinstance(body, bytes):
-            body = body.decode("utf-8")
-
-        if body is not None:
-            input_data += body
-
-    # Wrap the generated string with the App secret
-    input_data = secret + input_data + secret
-    # Generate the HMAC-SHA256 signature
-    return generate_sha256(input_data, secret)
-
-
-def generate_sha256(input_data, secret):
-    """
-    Generate HMAC-SHA256 signature for the given input and secret.
-
-    :param input_data: The data to be signed.
-    :param secret: The secret key used for signing.
-    :return: The generated signature in hexadecimal.
-    """
-    h = hmac.new(secret.encode("utf-8"), input_data.encode("utf-8"), hashlib.sha256)
-    return h.hexdigest()
+from models.queries import CHANNEL_BY_SHOP_ID, CHANNEL_BY_UID
+from utils.tiktok_client import tiktok_client
 
 
 def notify_new_order_v2(open_order, channel_uid, company_uid, dispatched_order=[]):
@@ -116,11 +48,10 @@ def notify_new_order_v2(open_order, channel_uid, company_uid, dispatched_order=[
 
 # Function to get the channel and token based on channel uuid
 async def get_channel_and_token(channel_uid: str):
-    with SessionLocal() as db:
+    async with AsyncSessionLocal() as db:
         try:
-            channel: Channel = (
-                db.query(Channel).filter(Channel.channel_uid == channel_uid).first()
-            )
+            result = await db.execute(CHANNEL_BY_UID, {"channel_uid": channel_uid})
+            channel: Channel = result.scalars().first()
 
             if not channel:
                 return None  # No matching channel found
@@ -131,43 +62,29 @@ async def get_channel_and_token(channel_uid: str):
             current_timestamp = int(datetime.datetime.now().timestamp())
             if current_timestamp > channel.access_token_expiry:
                 # need to get the new token and store it in the database
-                url: str = "https://auth.tiktok-shops.com/api/v2/token/refresh"
-                headers = {"Content-Type": "application/json"}
-                params: Dict[str, Any] = {
-                    "app_key": APP_KEY,
-                    "app_secret": APP_SECRET,
-                    "refresh_token": channel.refresh_token,
-                    "grant_type": "refresh_token",
-                }
-                response = requests.get(url, params=params, headers=headers).json()
-                if response.get("code") != 0:
+                response = await tiktok_client.call(
+                    "refresh_access_token",
+                    params={
+                        "refresh_token": channel.refresh_token,
+                        "grant_type": "refresh_token",
+                    },
+                )
+                if response.code != 0:
                     log.error("Failed to get new refresh token")
                     return None
 
-                data = response.get("data", {})
+                data = response.data
                 channel.access_token = data.get("access_token", "")
                 channel.refresh_token = data.get("refresh_token", "")
                 channel.access_token_expiry = int(data.get("access_token_expire_in", 0))
                 channel.refresh_token_expiry = int(
                     data.get("refresh_token_expire_in", 0)
                 )
-                db.commit()
-
-            # ✅ Force-load all fields so they stay after session closes
-            _ = channel.channel_uid
-            _ = channel.company_uuid
-            _ = channel.name
-            _ = channel.country
-            _ = channel.shop_id
-            _ = channel.shop_cipher
-            _ = channel.created_at
-            _ = channel.updated_at
-            _ = channel.access_token
-            _ = channel.refresh_token
-            _ = channel.access_token_expiry
-            _ = channel.refresh_token_expiry
+                await db.commit()
+                # updated_at is set by the database on update
+                await db.refresh(channel)
 
-            # ✅ Detach instance from session → safe to use in Celery
+            # ✅ Fields stay loaded (expire_on_commit=False), detach → safe to use in Celery
             db.expunge(channel)
 
             return channel
@@ -177,13 +94,20 @@ async def get_channel_and_token(channel_uid: str):
             return None
 
 
+def get_channel_by_shop_id(db: Session, shop_id) -> Optional[Channel]:
+    """Single row lookup on the unique ix_channels_shop_id index."""
+    return (
+        db.execute(CHANNEL_BY_SHOP_ID, {"shop_id": int(shop_id)})
+        .scalars()
+        .one_or_none()
+    )
+
+
 def get_channel_token_by_shop_id(shop_id: str):
     with SessionLocal() as db:
         try:
             # Fetch the Channel based on shop_id, along with the associated tokens
-            channel: Channel = (
-                db.query(Channel).filter(Channel.shop_id == int(shop_id)).first()
-            )
+            channel: Channel = get_channel_by_shop_id(db, shop_id)
 
             # If no matching channel is found, return None
             if not channel:
@@ -197,27 +121,24 @@ def get_channel_token_by_shop_id(shop_id: str):
             current_timestamp = int(datetime.datetime.now().timestamp())
             if current_timestamp > channel.access_token_expiry:
                 # Tokens are expired, so we need to refresh them
-                url = "https://auth.tiktok-shops.com/api/v2/token/refresh"
-                headers = {"Content-Type": "application/json"}
-                params: Dict[str, Any] = {
-                    "app_key": APP_KEY,
-                    "app_secret": APP_SECRET,
-                    "refresh_token": channel.refresh_token,
-                    "grant_type": "refresh_token",
-                }
-
                 # Make the request to refresh the access token
-                response = requests.get(url, params=params, headers=headers).json()
+                response = tiktok_client.request(
+                    "refresh_access_token",
+                    params={
+                        "refresh_token": channel.refresh_token,
+                        "grant_type": "refresh_token",
+                    },
+                )
 
                 # If the response code is not 0, it means the refresh token is invalid or there was an issue
-                if response.get("code") != 0:
+                if response.code != 0:
                     log.error(
-                        f"Failed to refresh token for shop_id {shop_id}. Response: {response}"
+                        f"Failed to refresh token for shop_id {shop_id}. Response: {response.json()}"
                     )
                     return None
 
                 # Parse the response and update the channel's tokens
-                data = response.get("data", {})
+                data = response.data
                 channel.access_token = data.get("access_token", "")
                 channel.refresh_token = data.get("refresh_token", "")
                 channel.access_token_expiry = int(data.get("access_token_expire_in", 0))
@@ -274,11 +195,7 @@ async def create_channel_in_mis(channel: Channel):
     }
     payload = json.dumps(payload)
     log.info("Channel data is sending into integration service")
-    # Run the async function synchronously
-    loop = asyncio.get_event_loop()
-    response = loop.run_until_complete(
-        requests.post(url, json=payload, headers=headers)
-    ).json()
+    response = requests.post(url, data=payload, headers=headers).json()
     if response.get("status_code") != 201:
         log.error("Failed to create channel in integration service")
         return None
@@ -0,0 +1,112 @@
+import datetime
+import logging as log
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import func, text
+
+from config.app_vars import WEBHOOK_DEDUP_MEMORY_SIZE, WEBHOOK_DEDUP_TTL
+from config.database import SessionLocal
+from models import WebhookNotification
+
+# Recently accepted notification ids of this process, oldest first
+_recent_notifications: "OrderedDict[str, float]" = OrderedDict()
+_recent_lock = threading.Lock()
+
+# Inserts the id, or refreshes it when the stored one is older than the TTL.
+# A returned row means the notification has not been seen within the TTL.
+_CLAIM_NOTIFICATION = text(
+    """
+    INSERT INTO webhooknotifications (tts_notification_id, shop_id, type, created_at)
+    VALUES (:tts_notification_id, :shop_id, :type, now())
+    ON CONFLICT (tts_notification_id) DO UPDATE SET created_at = now()
+    WHERE webhooknotifications.created_at < now() - make_interval(secs => :ttl)
+    RETURNING tts_notification_id
+    """
+)
+
+
+def _seen_recently(notification_id: str, now: float) -> bool:
+    with _recent_lock:
+        seen_at = _recent_notifications.get(notification_id)
+        if seen_at is not None and now - seen_at < WEBHOOK_DEDUP_TTL:
+            return True
+        return False
+
+
+def _remember(notification_id: str, now: float):
+    with _recent_lock:
+        _recent_notifications[notification_id] = now
+        _recent_notifications.move_to_end(notification_id)
+        while len(_recent_notifications) > WEBHOOK_DEDUP_MEMORY_SIZE:
+            _recent_notifications.popitem(last=False)
+
+
+def is_duplicate_notification(
+    notification_id: str, shop_id: str = None, type_: int = None
+) -> bool:
+    """
+    Record a webhook notification id and tell if it was already accepted.
+
+    The in-memory window answers redeliveries hitting the same process, the
+    shared table covers the other API processes. Errors fail open so a database
+    hiccup never drops a webhook.
+    """
+    if not notification_id:
+        return False
+    now = time.monotonic()
+    if _seen_recently(notification_id, now):
+        return True
+
+    with SessionLocal() as db:
+        try:
+            claimed = db.execute(
+                _CLAIM_NOTIFICATION,
+                {
+                    "tts_notification_id": notification_id,
+                    "shop_id": shop_id,
+                    "type": type_,
+                    "ttl": WEBHOOK_DEDUP_TTL,
+                },
+            ).first()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            log.error(f"Error checking webhook notification {notification_id}: {e}")
+            return False
+
+    _remember(notification_id, now)
+    return claimed is None
+
+
+def release_notification(notification_id: str):
+    """
+    Forget a claimed notification id whose webhook could not be queued, so the
+    redelivery from TikTok is accepted instead of answered as a duplicate.
+    """
+    if not notification_id:
+        return
+    with _recent_lock:
+        _recent_notifications.pop(notification_id, None)
+    with SessionLocal() as db:
+        try:
+            db.query(WebhookNotification).filter(
+                WebhookNotification.tts_notification_id == notification_id
+            ).delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            log.error(f"Error releasing webhook notification {notification_id}: {e}")
+
+
+def purge_expired_notifications() -> int:
+    cutoff = func.now() - datetime.timedelta(seconds=WEBHOOK_DEDUP_TTL)
+    with SessionLocal() as db:
+        deleted = (
+            db.query(WebhookNotification)
+            .filter(WebhookNotification.created_at < cutoff)
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+    return deleted
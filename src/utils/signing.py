@@ -0,0 +1,151 @@
+import hashlib
+import hmac
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+from config.app_vars import APP_KEY, APP_SECRET
+
+_UNSIGNED_PARAMS = frozenset({"sign", "access_token"})
+# Params that only change per shop, their {key}{value} pieces are cached
+_SHOP_PARAMS = ("app_key", "shop_cipher")
+_UNSIGNED_SHOP_PARAMS = _UNSIGNED_PARAMS | frozenset(_SHOP_PARAMS)
+_ABSENT = object()
+
+
+def _param_values(value) -> List[str]:
+    """Values of a param as TikTok signs them: str() of each, blanks dropped."""
+    values = value if isinstance(value, (list, tuple)) else (value,)
+    values = [v.decode("utf-8") if isinstance(v, bytes) else str(v) for v in values]
+    return [v for v in values if v]
+
+
+def _param_piece(key: str, value) -> Optional[Tuple[str, str]]:
+    values = _param_values(value)
+    return (key, key + "".join(values)) if values else None
+
+
+@lru_cache(maxsize=4096)
+def _shop_pieces(app_key, shop_cipher) -> Tuple[Tuple[str, str], ...]:
+    pieces = []
+    for key, value in zip(_SHOP_PARAMS, (app_key, shop_cipher)):
+        if value is not _ABSENT:
+            piece = _param_piece(key, value)
+            if piece:
+                pieces.append(piece)
+    return tuple(pieces)
+
+
+@lru_cache(maxsize=1024)
+def _path_hmac_state(secret: str, path: str):
+    """HMAC state that has already consumed the constant `secret + path` prefix."""
+    h = _hmac_state(secret).copy()
+    h.update((secret + path).encode("utf-8"))
+    return h
+
+
+def sign_request(
+    path: str,
+    params: Dict[str, Any],
+    body: Union[bytes, str, None] = None,
+    secret: str = APP_SECRET,
+) -> str:
+    """
+    TikTok Shop API signature of a request.
+
+    HMAC-SHA256, keyed with the app secret, of
+    `secret + path + {key}{value} of the sorted params + body + secret`, where
+    `sign`, `access_token` and params with blank values are left out.
+    """
+    shop_values = [params.get(key, _ABSENT) for key in _SHOP_PARAMS]
+    pieces, skipped = [], _UNSIGNED_PARAMS
+    # Only strings are cached, True and 1 would share a cache entry
+    if all(isinstance(v, str) or v is _ABSENT for v in shop_values):
+        pieces, skipped = list(_shop_pieces(*shop_values)), _UNSIGNED_SHOP_PARAMS
+    for key, value in params.items():
+        if key not in skipped:
+            piece = _param_piece(str(key), value)
+            if piece:
+                pieces.append(piece)
+    pieces.sort()
+
+    h = _path_hmac_state(secret, path).copy()
+    h.update("".join(piece for _, piece in pieces).encode("utf-8"))
+    if body is not None:
+        h.update(body if isinstance(body, bytes) else body.encode("utf-8"))
+    h.update(secret.encode("utf-8"))
+    return h.hexdigest()
+
+
+def sign_requests(
+    requests_to_sign: Iterable[Tuple[str, Dict[str, Any], Union[bytes, str, None]]],
+    secret: str = APP_SECRET,
+) -> List[str]:
+    """Signatures of many `(path, params, body)` requests, in order."""
+    return [
+        sign_request(path, params, body, secret)
+        for path, params, body in requests_to_sign
+    ]
+
+
+def calculate_signature(
+    url: str, params: dict, headers: dict, secret: str, body: bytes = None, **kwargs
+) -> str:
+    """
+    Calculate the signature based on query parameters, request path, and body.
+
+    :param url: Full URL of the request, only its path is signed.
+    :param params: Query parameters of the request.
+    :param headers: HTTP headers, a multipart/form-data body is not signed.
+    :param secret: The app secret key used for signing.
+    :param body: The request body as bytes or string.
+    :param kwargs: Extra query parameters, e.g. `timestamp`.
+    :return: The calculated signature as a hexadecimal string.
+    """
+    if kwargs:
+        params = {**params, **kwargs}
+    if headers.get("Content-Type", "").startswith("multipart/form-data"):
+        body = None
+    return sign_request(urlparse(url).path, params, body, secret)
+
+
+@lru_cache(maxsize=None)
+def _hmac_state(secret: str):
+    """HMAC-SHA256 object with the key already processed, copied for each use."""
+    return hmac.new(secret.encode("utf-8"), digestmod=hashlib.sha256)
+
+
+def generate_sha256(input_data, secret):
+    """
+    Generate HMAC-SHA256 signature for the given input and secret.
+
+    :param input_data: The data to be signed, as a string or raw bytes.
+    :param secret: The secret key used for signing.
+    :return: The generated signature in hexadecimal.
+    """
+    if isinstance(input_data, str):
+        input_data = input_data.encode("utf-8")
+    h = _hmac_state(secret).copy()
+    h.update(input_data)
+    return h.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _webhook_hmac_state(app_key: str, secret: str):
+    h = _hmac_state(secret).copy()
+    h.update(app_key.encode("utf-8"))
+    return h
+
+
+def verify_webhook_signature(body: bytes, signature: str) -> bool:
+    """
+    Check the Authorization header TikTok sends with every webhook.
+
+    The signature is the HMAC-SHA256 of the app key followed by the raw body,
+    keyed with the app secret. The body bytes are signed as received.
+    """
+    if not signature or not APP_SECRET:
+        return False
+    h = _webhook_hmac_state(APP_KEY or "", APP_SECRET).copy()
+    h.update(body)
+    return hmac.compare_digest(h.hexdigest(), signature)
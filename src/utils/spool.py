@@ -0,0 +1,188 @@
+import glob
+import logging as log
+import os
+import threading
+from typing import Any, Callable, Dict, List
+
+import orjson
+
+
+class SpoolFullError(Exception):
+    pass
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Spool:
+    """
+    Bounded append-only on-disk queue of JSON records, split in segment files.
+
+    Every process writes to its own `<pid>-<seq>.active` segment, which is sealed
+    to `.ndjson` when it grows past `segment_bytes` or before a drain. A drain
+    claims sealed segments by renaming them, so several processes can share the
+    directory without replaying a record twice.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int,
+        segment_bytes: int,
+        fsync: bool = True,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._pid = None
+        self._seq = 0
+        self._file = None
+        self._size = 0
+        self._pending = None
+
+    def _ensure_process(self):
+        # A forked process must not keep writing to its parent's segment
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._file = None
+            self._seq = 0
+            os.makedirs(self.directory, exist_ok=True)
+            self._recover()
+
+    def _open_segment(self):
+        self._ensure_process()
+        if self._file is None:
+            self._seq += 1
+            path = os.path.join(self.directory, f"{self._pid}-{self._seq:08d}.active")
+            self._file = open(path, "ab")
+            self._size = self._file.tell()
+        return self._file
+
+    def _seal_segment(self):
+        if self._file is None or self._pid != os.getpid():
+            return
+        path = self._file.name
+        self._file.close()
+        self._file = None
+        if os.path.getsize(path):
+            os.rename(path, path[: -len(".active")] + ".ndjson")
+        else:
+            os.unlink(path)
+
+    def _recover(self):
+        """Seal segments left behind by processes that are gone."""
+        for path in glob.glob(os.path.join(self.directory, "*.active")):
+            pid = int(os.path.basename(path).split("-", 1)[0])
+            if pid != self._pid and not _pid_alive(pid):
+                os.rename(path, path[: -len(".active")] + ".ndjson")
+        for path in glob.glob(os.path.join(self.directory, "*.draining")):
+            pid = int(path.rsplit(".", 2)[-2])
+            if not _pid_alive(pid):
+                os.rename(path, path.rsplit(".", 2)[0])
+
+    def _disk_usage(self) -> int:
+        return sum(
+            os.path.getsize(path)
+            for path in glob.glob(os.path.join(self.directory, "*"))
+            if os.path.isfile(path)
+        )
+
+    def has_pending(self) -> bool:
+        """
+        True while sealed segments or this process's own segment hold records.
+
+        The `.active` segments of other live processes are theirs to seal and
+        do not put this process in spool-only mode.
+        """
+        if self._pending is None:
+            own_segment = (
+                self._file is not None and self._pid == os.getpid() and self._size
+            )
+            self._pending = bool(
+                own_segment or glob.glob(os.path.join(self.directory, "*.ndjson"))
+            )
+        return self._pending
+
+    def append(self, record: Dict[str, Any]):
+        line = orjson.dumps(record) + b"\n"
+        with self._lock:
+            segment = self._open_segment()
+            if self._disk_usage() + len(line) > self.max_bytes:
+                raise SpoolFullError(f"Spool {self.directory} is full")
+            segment.write(line)
+            segment.flush()
+            if self.fsync:
+                os.fsync(segment.fileno())
+            self._size += len(line)
+            self._pending = True
+            if self._size >= self.segment_bytes:
+                self._seal_segment()
+
+    def drain(
+        self, replay: Callable[[List[Dict[str, Any]]], None], batch_size: int = 100
+    ) -> int:
+        """
+        Replay sealed segments oldest first, `batch_size` records per call.
+
+        A segment is deleted once all its records are replayed. When `replay`
+        raises, the records not yet replayed are put back and draining stops.
+        """
+        if not os.path.isdir(self.directory):
+            self._pending = False
+            return 0
+        with self._lock:
+            self._ensure_process()
+            self._seal_segment()
+            # Processes that crashed after this one started leave segments too
+            self._recover()
+
+        replayed = 0
+        segments = sorted(
+            glob.glob(os.path.join(self.directory, "*.ndjson")),
+            key=lambda path: (os.path.getmtime(path), os.path.basename(path)),
+        )
+        for path in segments:
+            claimed = f"{path}.{os.getpid()}.draining"
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue  # Another process claimed it
+
+            with open(claimed, "rb") as segment:
+                records = [orjson.loads(line) for line in segment if line.strip()]
+            done = 0
+            try:
+                while done < len(records):
+                    batch = records[done : done + batch_size]
+                    replay(batch)
+                    done += len(batch)
+                    replayed += len(batch)
+            except Exception as e:
+                # Records of the failed batch may be replayed twice, never lost
+                log.error(f"Spool replay stopped after {replayed} records: {e}")
+                # Put the rest back with the segment's mtime, so it keeps its
+                # place ahead of newer segments
+                stat = os.stat(claimed)
+                remaining = f"{claimed}.rest"
+                with open(remaining, "wb") as segment:
+                    segment.writelines(orjson.dumps(r) + b"\n" for r in records[done:])
+                os.utime(remaining, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+                os.rename(remaining, path)
+                os.unlink(claimed)
+                with self._lock:
+                    self._pending = None
+                return replayed
+            os.unlink(claimed)
+
+        with self._lock:
+            self._pending = None
+        return replayed
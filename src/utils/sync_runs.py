@@ -0,0 +1,397 @@
+import datetime
+import logging as log
+import uuid
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, case, func, not_, or_, update
+
+from config.app_vars import SYNC_RUN_STALE_SECONDS
+from config.database import SessionLocal
+from models import Channel, SyncRun
+
+UNFINISHED_STATUSES = [
+    SyncRun.StatusChoices.PENDING,
+    SyncRun.StatusChoices.QUEUED,
+    SyncRun.StatusChoices.RUNNING,
+    SyncRun.StatusChoices.FAILED,
+]
+
+
+# Errors of a run that cannot be resumed from its checkpoint
+PAGE_TOKEN_ERRORS = ("page_token", "page token")
+
+
+def is_page_token_error(error: Optional[str]) -> bool:
+    return bool(error) and any(text in error.lower() for text in PAGE_TOKEN_ERRORS)
+
+
+def _held_by_worker():
+    """A RUNNING run whose worker checkpointed recently."""
+    return and_(
+        SyncRun.status == SyncRun.StatusChoices.RUNNING,
+        SyncRun.updated_at
+        >= func.now() - datetime.timedelta(seconds=SYNC_RUN_STALE_SECONDS),
+    )
+
+
+def start_or_resume_sync_run(
+    channel_uid: str, force: bool = False
+) -> Optional[SyncRun]:
+    """
+    Return the PENDING run a new sync of the channel should drive.
+
+    The unfinished run is resumed from its checkpoint, unless `force` is set or
+    it failed on an expired page token, then it is closed and a new run is
+    started. A run another worker is driving is returned as is (RUNNING) and
+    must not be started again, as is a QUEUED one a batch has dispatched.
+    """
+    with SessionLocal() as db:
+        try:
+            sync_run: SyncRun = (
+                db.query(SyncRun)
+                .filter(
+                    SyncRun.channel_uid == channel_uid,
+                    SyncRun.status.in_(UNFINISHED_STATUSES),
+                )
+                .order_by(SyncRun.id.desc())
+                .with_for_update()
+                .first()
+            )
+            if sync_run and (
+                sync_run.status == SyncRun.StatusChoices.QUEUED
+                or db.query(SyncRun.id)
+                .filter(SyncRun.id == sync_run.id, _held_by_worker())
+                .first()
+            ):
+                log.info(f"Sync run {sync_run.id} of channel {channel_uid} is running")
+                db.rollback()
+                db.expunge(sync_run)
+                return sync_run
+
+            if sync_run and (force or is_page_token_error(sync_run.error)):
+                log.info(f"Closing sync run {sync_run.id}, starting a new one")
+                db.query(SyncRun).filter(
+                    SyncRun.channel_uid == channel_uid,
+                    SyncRun.status.in_(UNFINISHED_STATUSES),
+                ).update(
+                    {
+                        SyncRun.status: SyncRun.StatusChoices.FAILED,
+                        SyncRun.batch_uid: None,
+                        SyncRun.error: sync_run.error or "Replaced by a new sync run",
+                        SyncRun.finished_at: func.now(),
+                    },
+                    synchronize_session=False,
+                )
+                sync_run = None
+
+            if sync_run:
+                log.info(
+                    f"Resuming sync run {sync_run.id} of channel {channel_uid} "
+                    f"from page {sync_run.pages}"
+                )
+                sync_run.status = SyncRun.StatusChoices.PENDING
+            else:
+                sync_run = SyncRun(
+                    channel_uid=channel_uid,
+                    status=SyncRun.StatusChoices.PENDING,
+                    next_page_token="",
+                    pages=0,
+                    total_products=0,
+                    skipped_products=0,
+                )
+                db.add(sync_run)
+            db.commit()
+            db.refresh(sync_run)
+            db.expunge(sync_run)
+            return sync_run
+        except Exception as e:
+            db.rollback()
+            log.error(f"Error starting sync run for channel {channel_uid}: {e}")
+            return None
+
+
+def claim_sync_run(
+    sync_run_id: int, task_id: str = None, take_over: bool = False
+) -> Optional[SyncRun]:
+    """
+    Atomically mark the run RUNNING for the task `task_id` and return it.
+
+    None when the run is finished or another live task is driving it. A RUNNING
+    run is taken over when it has no checkpoint for SYNC_RUN_STALE_SECONDS, when
+    it is held by the same task id (its message was redelivered after the worker
+    died) or with `take_over` for a message the broker marked as redelivered.
+    """
+    running = SyncRun.status == SyncRun.StatusChoices.RUNNING
+    if not take_over:
+        stale = not_(_held_by_worker())
+        if task_id:
+            stale = or_(stale, SyncRun.task_id == task_id)
+        running = and_(running, stale)
+    with SessionLocal() as db:
+        sync_run = (
+            db.execute(
+                update(SyncRun)
+                .where(
+                    SyncRun.id == sync_run_id,
+                    or_(
+                        SyncRun.status.in_(
+                            [
+                                SyncRun.StatusChoices.PENDING,
+                                SyncRun.StatusChoices.QUEUED,
+                                SyncRun.StatusChoices.FAILED,
+                            ]
+                        ),
+                        running,
+                    ),
+                )
+                .values(
+                    status=SyncRun.StatusChoices.RUNNING,
+                    task_id=task_id,
+                    error=None,
+                    finished_at=None,
+                    started_at=case(
+                        (SyncRun.pages == 0, func.now()), else_=SyncRun.started_at
+                    ),
+                    updated_at=func.now(),
+                )
+                .returning(SyncRun)
+                .execution_options(synchronize_session=False)
+            )
+            .scalars()
+            .first()
+        )
+        db.commit()
+        if sync_run:
+            db.refresh(sync_run)
+            db.expunge(sync_run)
+        return sync_run
+
+
+def get_sync_run(sync_run_id: int) -> Optional[SyncRun]:
+    with SessionLocal() as db:
+        sync_run = db.get(SyncRun, sync_run_id)
+        if sync_run:
+            db.expunge(sync_run)
+        return sync_run
+
+
+def get_channel_shop_id(channel_uid: str) -> Optional[int]:
+    """TikTok shop id of a channel, the key its tasks are sharded by."""
+    with SessionLocal() as db:
+        return (
+            db.query(Channel.shop_id)
+            .filter(Channel.channel_uid == channel_uid)
+            .scalar()
+        )
+
+
+def get_latest_sync_run(channel_uid: str) -> Optional[SyncRun]:
+    with SessionLocal() as db:
+        sync_run = (
+            db.query(SyncRun)
+            .filter(SyncRun.channel_uid == channel_uid)
+            .order_by(SyncRun.id.desc())
+            .first()
+        )
+        if sync_run:
+            db.expunge(sync_run)
+        return sync_run
+
+
+def checkpoint_sync_run(
+    sync_run_id: int,
+    next_page_token: str,
+    pages: int,
+    total_products: int,
+    skipped_products: int,
+):
+    """Persist the progress of a sync run after a page has been processed."""
+    with SessionLocal() as db:
+        db.query(SyncRun).filter(SyncRun.id == sync_run_id).update(
+            {
+                SyncRun.next_page_token: next_page_token,
+                SyncRun.pages: pages,
+                SyncRun.total_products: total_products,
+                SyncRun.skipped_products: skipped_products,
+                # Keeps the run held by this worker, see claim_sync_run
+                SyncRun.updated_at: func.now(),
+            }
+        )
+        db.commit()
+
+
+def finish_sync_run(sync_run_id: int, status: str, error: str = None):
+    """Close a run as COMPLETED or FAILED, a FAILED one can still be resumed."""
+    with SessionLocal() as db:
+        db.query(SyncRun).filter(SyncRun.id == sync_run_id).update(
+            {
+                SyncRun.status: status,
+                SyncRun.error: error,
+                # Database clock, like started_at and updated_at
+                SyncRun.finished_at: func.now(),
+            }
+        )
+        db.commit()
+
+
+def create_sync_batch(channel_uids: List[str] = None) -> Optional[str]:
+    """
+    Queue a PENDING sync run for every channel under a new batch uid.
+
+    All channels with tokens are used when no channel uids are given. Unfinished
+    runs are moved into the batch so they resume from their checkpoint, channels
+    that are syncing right now are left out.
+    """
+    batch_uid = uuid.uuid4().hex
+    with SessionLocal() as db:
+        if channel_uids is None:
+            channel_uids = [
+                channel_uid
+                for (channel_uid,) in db.query(Channel.channel_uid).filter(
+                    Channel.access_token.isnot(None)
+                )
+            ]
+        if not channel_uids:
+            return None
+        unfinished = {
+            sync_run.channel_uid: sync_run
+            for sync_run in db.query(SyncRun)
+            .filter(
+                SyncRun.channel_uid.in_(channel_uids),
+                SyncRun.status.in_(UNFINISHED_STATUSES),
+            )
+            .order_by(SyncRun.id.asc())
+        }
+        for channel_uid in channel_uids:
+            sync_run = unfinished.get(channel_uid)
+            if sync_run and sync_run.status in (
+                SyncRun.StatusChoices.QUEUED,
+                SyncRun.StatusChoices.RUNNING,
+            ):
+                log.info(f"Channel {channel_uid} is already syncing, skipping")
+                continue
+            if sync_run:
+                sync_run.batch_uid = batch_uid
+                sync_run.status = SyncRun.StatusChoices.PENDING
+                continue
+            db.add(
+                SyncRun(
+                    channel_uid=channel_uid,
+                    batch_uid=batch_uid,
+                    status=SyncRun.StatusChoices.PENDING,
+                    next_page_token="",
+                    pages=0,
+                    total_products=0,
+                    skipped_products=0,
+                )
+            )
+        db.commit()
+    return batch_uid
+
+
+def claim_next_sync_run(batch_uid: str) -> Optional[SyncRun]:
+    """Mark the oldest PENDING run of the batch as QUEUED and return it."""
+    with SessionLocal() as db:
+        sync_run: SyncRun = (
+            db.query(SyncRun)
+            .filter(
+                SyncRun.batch_uid == batch_uid,
+                SyncRun.status == SyncRun.StatusChoices.PENDING,
+            )
+            .order_by(SyncRun.id.asc())
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if not sync_run:
+            return None
+        # The worker claims it with claim_sync_run
+        sync_run.status = SyncRun.StatusChoices.QUEUED
+        db.commit()
+        db.refresh(sync_run)
+        db.expunge(sync_run)
+        return sync_run
+
+
+def get_sync_batch_progress(batch_uid: str) -> Optional[Dict[str, Any]]:
+    with SessionLocal() as db:
+        runs_by_status = dict(
+            db.query(SyncRun.status, func.count(SyncRun.id))
+            .filter(SyncRun.batch_uid == batch_uid)
+            .group_by(SyncRun.status)
+            .all()
+        )
+        if not runs_by_status:
+            return None
+        (
+            total_products,
+            skipped_products,
+            pages,
+            started_at,
+            finished_at,
+            updated_at,
+        ) = (
+            db.query(
+                func.coalesce(func.sum(SyncRun.total_products), 0),
+                func.coalesce(func.sum(SyncRun.skipped_products), 0),
+                func.coalesce(func.sum(SyncRun.pages), 0),
+                func.min(SyncRun.started_at),
+                func.max(SyncRun.finished_at),
+                func.max(SyncRun.updated_at),
+            )
+            .filter(SyncRun.batch_uid == batch_uid)
+            .one()
+        )
+
+    unfinished = sum(
+        count
+        for status, count in runs_by_status.items()
+        if status != SyncRun.StatusChoices.COMPLETED
+    )
+    # Timestamps all come from the database clock, an unfinished batch is
+    # measured up to its last checkpoint
+    end = finished_at if not unfinished and finished_at else updated_at
+    elapsed_seconds = (end - started_at).total_seconds() if started_at and end else 0
+    return {
+        "batch_uid": batch_uid,
+        "channels": sum(runs_by_status.values()),
+        "runs_by_status": runs_by_status,
+        "pages": pages,
+        "total_products": total_products,
+        "skipped_products": skipped_products,
+        "started_at": started_at,
+        "finished_at": finished_at if not unfinished else None,
+        "elapsed_seconds": round(elapsed_seconds, 2),
+        "products_per_second": (
+            round(total_products / elapsed_seconds, 2) if elapsed_seconds else 0
+        ),
+    }
+
+
+def serialize_sync_run(sync_run: SyncRun) -> Dict[str, Any]:
+    # Database clock, a running sync is measured up to its last checkpoint
+    end = sync_run.finished_at or sync_run.updated_at
+    elapsed_seconds = (
+        (end - sync_run.started_at).total_seconds()
+        if sync_run.started_at and end
+        else 0
+    )
+    return {
+        "id": sync_run.id,
+        "channel_uid": sync_run.channel_uid,
+        "batch_uid": sync_run.batch_uid,
+        "status": sync_run.status,
+        "pages": sync_run.pages,
+        "total_products": sync_run.total_products,
+        "skipped_products": sync_run.skipped_products,
+        "next_page_token": sync_run.next_page_token,
+        "error": sync_run.error,
+        "started_at": sync_run.started_at,
+        "finished_at": sync_run.finished_at,
+        "updated_at": sync_run.updated_at,
+        "elapsed_seconds": round(elapsed_seconds, 2),
+        "products_per_second": (
+            round(sync_run.total_products / elapsed_seconds, 2)
+            if elapsed_seconds
+            else 0
+        ),
+    }
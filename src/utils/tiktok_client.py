@@ -0,0 +1,373 @@
+import asyncio
+import json
+import logging as log
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Union
+
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+
+from config.app_vars import (
+    APP_KEY,
+    APP_SECRET,
+    TIKTOK_AUTH_URL,
+    TIKTOK_HTTP_POOL_SIZE,
+    TIKTOK_MAX_RETRIES,
+    TIKTOK_MAX_RETRY_AFTER,
+    TIKTOK_OPEN_API_URL,
+    TIKTOK_RATE_LIMITS,
+    TIKTOK_RETRY_BACKOFF,
+)
+from utils.signing import sign_request
+
+OPEN_API, AUTH = "open_api", "auth"
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    method: str
+    # Formatted with the path params of the call, e.g. {product_id}
+    path: str
+    rate_limit: str
+    family: str = OPEN_API
+    timeout: float = 10
+    # False for writes that must not be sent twice
+    retry: bool = True
+
+
+ENDPOINTS: Dict[str, Endpoint] = {
+    # Auth API, app_key / app_secret instead of a signature
+    "get_access_token": Endpoint("GET", "/api/v2/token/get", "auth", family=AUTH),
+    "refresh_access_token": Endpoint(
+        "GET", "/api/v2/token/refresh", "auth", family=AUTH
+    ),
+    # Shops
+    "get_authorized_shops": Endpoint("GET", "/authorization/202309/shops", "shop"),
+    "get_active_shops": Endpoint("GET", "/seller/202309/shops", "shop"),
+    # Orders
+    "get_order_details": Endpoint("GET", "/order/202309/orders", "order"),
+    "search_orders": Endpoint(
+        "POST", "/order/202309/orders/search", "order", timeout=30
+    ),
+    # Products
+    "get_product": Endpoint("GET", "/product/202309/products/{product_id}", "product"),
+    "search_products": Endpoint(
+        "POST", "/product/202309/products/search", "product", timeout=30
+    ),
+    "update_inventory": Endpoint(
+        "POST",
+        "/product/202309/products/{product_id}/inventory/update",
+        "inventory",
+        timeout=15,
+    ),
+    # Logistics and fulfillment
+    "get_shipping_providers": Endpoint(
+        "GET",
+        "/logistics/202309/delivery_options/{delivery_option_id}/shipping_providers",
+        "fulfillment",
+    ),
+    "get_package": Endpoint(
+        "GET", "/fulfillment/202309/packages/{package_id}", "fulfillment"
+    ),
+    "ship_package": Endpoint(
+        "POST",
+        "/fulfillment/202309/orders/{order_id}/packages",
+        "fulfillment",
+        retry=False,
+    ),
+    "update_shipping_info": Endpoint(
+        "POST",
+        "/fulfillment/202309/packages/{package_id}/shipping_info/update",
+        "fulfillment",
+    ),
+}
+
+
+class TiktokResponse:
+    """
+    A TikTok API response with its body decoded once, by orjson, on the thread
+    that made the call. `json()` returns that same dict on every call.
+    """
+
+    __slots__ = ("status_code", "headers", "content", "_json")
+
+    def __init__(self, response: requests.Response):
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.content = response.content
+        try:
+            self._json = orjson.loads(self.content) if self.content else {}
+        except orjson.JSONDecodeError:
+            log.warning(
+                f"TikTok returned a non JSON body with status {self.status_code}"
+            )
+            self._json = {}
+        if not isinstance(self._json, dict):
+            self._json = {"data": self._json}
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    def json(self) -> Dict[str, Any]:
+        return self._json
+
+    @property
+    def code(self) -> Optional[int]:
+        """TikTok result code, 0 on success."""
+        return self._json.get("code")
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        return self._json.get("data") or {}
+
+    @property
+    def message(self) -> str:
+        return self._json.get("message", "")
+
+    @property
+    def request_id(self) -> str:
+        return str(self._json.get("request_id", ""))
+
+
+class RateLimiter:
+    """
+    Token bucket per (rate limit class, shop), a second worth of burst.
+
+    The buckets live in the process, they do not coordinate with the other
+    API and worker processes calling the same shop.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        self.rates = rates
+        self._lock = threading.Lock()
+        self._buckets: Dict[tuple, tuple] = {}
+
+    def wait(self, rate_class: str, shop: str) -> float:
+        rate = self.rates.get(rate_class)
+        if not rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated = self._buckets.get((rate_class, shop), (rate, now))
+            # Taking a token ahead of time reserves the slot of this request
+            tokens = min(rate, tokens + (now - updated) * rate) - 1
+            self._buckets[(rate_class, shop)] = (tokens, now)
+        delay = -tokens / rate if tokens < 0 else 0.0
+        if delay:
+            time.sleep(delay)
+        return delay
+
+
+class EndpointStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def record(self, name: str, **counts: float):
+        with self._lock:
+            stats = self._stats.setdefault(
+                name,
+                {
+                    "calls": 0,
+                    "errors": 0,
+                    "retries": 0,
+                    "throttled_seconds": 0.0,
+                    "latency_total": 0.0,
+                    "latency_max": 0.0,
+                },
+            )
+            for key, value in counts.items():
+                if key == "latency_max":
+                    stats[key] = max(stats[key], value)
+                else:
+                    stats[key] += value
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                name: {
+                    **{key: round(value, 4) for key, value in stats.items()},
+                    "latency_avg": round(
+                        (
+                            stats["latency_total"] / stats["calls"]
+                            if stats["calls"]
+                            else 0
+                        ),
+                        4,
+                    ),
+                }
+                for name, stats in self._stats.items()
+            }
+
+
+class TiktokClient:
+    """
+    Executes the calls of the ENDPOINTS table: builds the URL, adds app_key,
+    shop_cipher and timestamp, signs, rate limits per shop, retries and
+    records per endpoint stats. Connections are kept alive per process.
+    """
+
+    def __init__(
+        self,
+        base_urls: Dict[str, str],
+        app_key: str = APP_KEY,
+        app_secret: str = APP_SECRET,
+        pool_size: int = 20,
+        max_retries: int = 2,
+        retry_backoff: float = 0.5,
+        max_retry_after: float = 10,
+        rate_limits: Optional[Dict[str, float]] = None,
+    ):
+        self.base_urls = base_urls
+        self.app_key = app_key
+        self.app_secret = app_secret
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_retry_after = max_retry_after
+        self.rate_limiter = RateLimiter(rate_limits or {})
+        self.stats = EndpointStats()
+        self._lock = threading.Lock()
+        self._session = None
+        self._pid = None
+
+    @property
+    def session(self) -> requests.Session:
+        # A forked process must not share its parent's sockets
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=len(self.base_urls),
+                        pool_maxsize=self.pool_size,
+                    )
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session, self._pid = session, os.getpid()
+        return self._session
+
+    def _prepare(
+        self,
+        endpoint: Endpoint,
+        path: str,
+        params: Dict[str, Any],
+        body: Optional[bytes],
+        access_token: Optional[str],
+        shop_cipher: Optional[str],
+    ):
+        if endpoint.family == AUTH:
+            params = {"app_key": self.app_key, "app_secret": self.app_secret, **params}
+            return params, {"Content-Type": "application/json"}
+
+        params = {"app_key": self.app_key, **params}
+        if shop_cipher:
+            params["shop_cipher"] = shop_cipher
+        params["timestamp"] = int(time.time())
+        params["sign"] = sign_request(path, params, body, self.app_secret)
+        headers = {"Content-Type": "application/json"}
+        if access_token:
+            headers["x-tts-access-token"] = access_token
+        return params, headers
+
+    def request(
+        self,
+        name: str,
+        access_token: Optional[str] = None,
+        shop_cipher: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None,
+        body: Union[Dict[str, Any], str, bytes, None] = None,
+        **path_params: Any,
+    ) -> TiktokResponse:
+        """
+        Call the endpoint `name` of ENDPOINTS.
+
+        :param params: Query params of the call, without app_key and signature.
+        :param body: JSON body, a dict is serialized once and signed as sent.
+        :param path_params: Values of the path template, e.g. `product_id`.
+        :return: The last response, raises when every attempt failed to connect.
+        """
+        endpoint = ENDPOINTS[name]
+        path = endpoint.path.format(**path_params)
+        url = self.base_urls[endpoint.family] + path
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body)
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        attempts = 1 + (self.max_retries if endpoint.retry else 0)
+
+        for attempt in range(attempts):
+            throttled = self.rate_limiter.wait(endpoint.rate_limit, shop_cipher or "")
+            query, headers = self._prepare(
+                endpoint, path, params or {}, body, access_token, shop_cipher
+            )
+            started = time.perf_counter()
+            response, error = None, None
+            try:
+                response = self.session.request(
+                    endpoint.method,
+                    url,
+                    params=query,
+                    headers=headers,
+                    data=body,
+                    timeout=endpoint.timeout,
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            latency = time.perf_counter() - started
+            failed = error is not None or response.status_code >= 400
+            self.stats.record(
+                name,
+                calls=1,
+                errors=int(failed),
+                retries=int(attempt > 0),
+                throttled_seconds=throttled,
+                latency_total=latency,
+                latency_max=latency,
+            )
+
+            retryable = error is not None or response.status_code in RETRY_STATUSES
+            if not retryable or attempt == attempts - 1:
+                break
+            delay = self.retry_backoff * 2**attempt
+            if (
+                response is not None
+                and response.headers.get("Retry-After", "").isdigit()
+            ):
+                retry_after = int(response.headers["Retry-After"])
+                if retry_after > self.max_retry_after:
+                    log.warning(
+                        f"TikTok {name} asked to retry after {retry_after}s, "
+                        "giving up for now"
+                    )
+                    break
+                delay = max(delay, retry_after)
+            log.warning(
+                f"TikTok {name} failed ({error or response.status_code}), "
+                f"retrying in {delay}s"
+            )
+            time.sleep(delay)
+
+        if error is not None:
+            raise error
+        return TiktokResponse(response)
+
+    async def call(self, name: str, **kwargs: Any) -> TiktokResponse:
+        """`request` on a thread, for the async controllers and tasks."""
+        return await asyncio.to_thread(self.request, name, **kwargs)
+
+
+tiktok_client = TiktokClient(
+    base_urls={OPEN_API: TIKTOK_OPEN_API_URL, AUTH: TIKTOK_AUTH_URL},
+    pool_size=TIKTOK_HTTP_POOL_SIZE,
+    max_retries=TIKTOK_MAX_RETRIES,
+    retry_backoff=TIKTOK_RETRY_BACKOFF,
+    max_retry_after=TIKTOK_MAX_RETRY_AFTER,
+    rate_limits=TIKTOK_RATE_LIMITS,
+)
@@ -0,0 +1,255 @@
+"""
+Asyncio worker for the I/O bound task families (orders, products, inventory).
+
+Run it from the `src` folder next to, or instead of, the prefork worker:
+
+    python -m workers.asyncio_worker
+
+It consumes the Celery queues with the existing task names and message
+format, runs up to ASYNC_WORKER_CONCURRENCY tasks at once in one process and
+acks every message only after its task has finished. Failures are handled as
+the prefork worker does: `autoretry_for` (applied by Celery around `task.run`)
+publishes the next attempt, any other exception acks the message, or rejects it
+when the task sets `acks_on_failure_or_timeout=False`. The broker connection is
+re-established when it drops; the messages in flight are then redelivered.
+
+It has no time limits; `celery -A config.worker.cel_app worker -P threads -c N`
+runs the same tasks on Celery's own thread pool when those are needed, with a
+"thread_worker" database pool of N connections.
+"""
+
+import asyncio
+import logging as log
+import os
+import queue
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from celery.exceptions import Ignore, Reject, Retry
+from celery.signals import worker_process_init, worker_process_shutdown
+from kombu import Connection, Consumer
+
+import tasks  # noqa: F401 registers the task names
+from config.app_vars import (
+    ASYNC_WORKER_CONCURRENCY,
+    ASYNC_WORKER_QUEUES,
+    RABBIT_URL,
+    WORKER_PREFETCH_MULTIPLIER,
+)
+from config.database import use_db_role
+from config.worker import cel_app
+from utils.async_runtime import start_async_runtime
+
+ACK, REJECT, REQUEUE = "ack", "reject", "requeue"
+RECONNECT_INTERVAL = 5
+
+
+def _base_queue(name: str) -> str:
+    """Queue name without the shard suffix, `tiktok-queue.3` -> `tiktok-queue`."""
+    base, _, shard = name.rpartition(".")
+    return base if base and shard.isdigit() else name
+
+
+class AsyncioWorker:
+    """
+    The event loop schedules the tasks and bounds how many run at once, the
+    blocking task bodies (requests, SQLAlchemy) run on a thread pool of the
+    same size. All broker I/O, acks included, stays on the connection thread.
+    """
+
+    def __init__(self, concurrency: int, queue_names: List[str]):
+        self.concurrency = concurrency
+        self.queues = [
+            q
+            for q in cel_app.conf.task_queues
+            # A base name selects every shard of the queue
+            if not queue_names
+            or q.name in queue_names
+            or _base_queue(q.name) in queue_names
+        ]
+        self.hostname = f"asyncio@{socket.gethostname()}"
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="task"
+        )
+        self._settled = queue.Queue()
+        self._in_flight = 0
+        self._stopping = threading.Event()
+        self._loop = None
+        self._semaphore = None
+        self._stop_event = None
+
+    def stop(self):
+        log.info("Asyncio worker stopping, waiting for running tasks")
+        self._stopping.set()
+        self._stop_event.set()
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._stop_event = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            self._loop.add_signal_handler(sig, self.stop)
+
+        # The task threads all wait on the runtime loop's to_thread calls
+        start_async_runtime(self.concurrency)
+        worker_process_init.send(sender=None)
+        # Sized for ASYNC_WORKER_CONCURRENCY tasks instead of one per process
+        use_db_role("async_worker")
+        try:
+            await self._loop.run_in_executor(None, self._consume)
+        finally:
+            self._executor.shutdown(wait=True)
+            worker_process_shutdown.send(sender=None, pid=os.getpid(), exitcode=0)
+
+    # Connection thread
+
+    def _consume(self):
+        while not self._stopping.is_set() or self._in_flight:
+            try:
+                self._consume_connection()
+            except Exception as e:
+                # Acks of the messages of the lost channel fail, the broker
+                # redelivers them
+                log.error(
+                    f"Broker connection lost, reconnecting in {RECONNECT_INTERVAL}s: {e}"
+                )
+                time.sleep(RECONNECT_INTERVAL)
+                self._settle_messages()
+
+    def _consume_connection(self):
+        with Connection(RABBIT_URL, heartbeat=30) as connection:
+            consumer = Consumer(
+                connection.channel(),
+                queues=self.queues,
+                callbacks=[self._on_message],
+                accept=["json"],
+                prefetch_count=self.concurrency * max(WORKER_PREFETCH_MULTIPLIER, 1),
+            )
+            consuming = True
+            with consumer:
+                log.info(
+                    f"Asyncio worker consuming {[q.name for q in self.queues]} "
+                    f"with concurrency {self.concurrency}"
+                )
+                while not self._stopping.is_set() or self._in_flight:
+                    if consuming and self._stopping.is_set():
+                        consumer.cancel()
+                        consuming = False
+                    try:
+                        connection.drain_events(timeout=0.2)
+                    except socket.timeout:
+                        connection.heartbeat_check()
+                    self._settle_messages()
+
+    def _on_message(self, body, message):
+        self._in_flight += 1
+        asyncio.run_coroutine_threadsafe(self._handle(body, message), self._loop)
+
+    def _settle_messages(self):
+        while True:
+            try:
+                message, outcome = self._settled.get_nowait()
+            except queue.Empty:
+                return
+            self._in_flight -= 1
+            try:
+                if outcome == ACK:
+                    message.ack()
+                elif outcome == REQUEUE:
+                    message.requeue()
+                else:
+                    message.reject()
+            except Exception as e:
+                log.error(f"Failed to {outcome} message: {e}")
+
+    # Event loop
+
+    async def _handle(self, body, message):
+        outcome = REJECT
+        try:
+            name = message.headers.get("task")
+            task = cel_app.tasks.get(name)
+            if task is None:
+                log.error(f"Received unregistered task {name}")
+                return
+
+            # Countdown / retry delay: wait without taking a concurrency slot
+            eta = message.headers.get("eta")
+            if eta:
+                delay = (
+                    datetime.fromisoformat(eta) - datetime.now(timezone.utc)
+                ).total_seconds()
+                if delay > 0:
+                    try:
+                        await asyncio.wait_for(self._stop_event.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+
+            async with self._semaphore:
+                if self._stopping.is_set():
+                    outcome = REQUEUE
+                    return
+                outcome = await self._loop.run_in_executor(
+                    self._executor, self._run_task, task, body, message
+                )
+        except Exception as e:
+            log.error(f"Failed to handle message: {e}")
+        finally:
+            self._settled.put((message, outcome))
+
+    # Task threads
+
+    def _run_task(self, task, body, message) -> str:
+        headers: Dict[str, Any] = message.headers
+        args, kwargs, embed = body
+        task.push_request(
+            id=headers.get("id"),
+            task=task.name,
+            args=args,
+            kwargs=kwargs,
+            retries=headers.get("retries", 0),
+            eta=headers.get("eta"),
+            root_id=headers.get("root_id"),
+            parent_id=headers.get("parent_id"),
+            group=headers.get("group"),
+            callbacks=embed.get("callbacks"),
+            errbacks=embed.get("errbacks"),
+            delivery_info=message.delivery_info,
+            reply_to=message.properties.get("reply_to"),
+            correlation_id=message.properties.get("correlation_id"),
+            hostname=self.hostname,
+            called_directly=False,
+            is_eager=False,
+        )
+        try:
+            task.run(*args, **kwargs)
+            return ACK
+        except Retry:
+            # task.retry() has already published the next attempt
+            return ACK
+        except Ignore:
+            return ACK
+        except Reject as e:
+            return REQUEUE if e.requeue else REJECT
+        except Exception as e:
+            log.exception(f"Task {task.name}[{headers.get('id')}] failed: {e}")
+            return ACK if task.acks_on_failure_or_timeout else REJECT
+        finally:
+            task.pop_request()
+
+
+def main():
+    log.basicConfig(
+        level=log.INFO, format="%(asctime)s %(levelname)s %(threadName)s %(message)s"
+    )
+    worker = AsyncioWorker(ASYNC_WORKER_CONCURRENCY, ASYNC_WORKER_QUEUES)
+    asyncio.run(worker.run())
+
+
+if __name__ == "__main__":
+    main()